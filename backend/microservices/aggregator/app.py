@@ -7,20 +7,21 @@ Aggregator Microservice
 Aggregates country-level emotion data
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import logging
 import os
 import sys
-import json
 from collections import defaultdict, Counter
+from datetime import datetime
 import re
 
 # Add shared module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
-from database import SharedDatabase
+from database import SharedDatabase, fetch_post_urls
 from config import DB_PATH
+import fast_json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,6 +34,16 @@ CORS(app)
 db = SharedDatabase(DB_PATH)
 
 
+# Per-emotion sums of analyzed events, reduced by SQLite instead of row by row
+# in Python; post_ids that are not valid JSON count as no posts
+EMOTION_SUMS_SELECT = '''
+    SELECT LOWER(country), emotion, SUM(confidence), COUNT(*),
+           SUM(CASE WHEN json_valid(post_ids) THEN json_array_length(post_ids) ELSE 0 END)
+    FROM events
+    WHERE is_analyzed = 1 AND emotion IS NOT NULL AND emotion != ''
+'''
+
+
 class CountryEmotionAggregator:
     """Aggregates emotions at country level from events"""
 
@@ -44,10 +55,9 @@ class CountryEmotionAggregator:
         # Normalize country name to lowercase for consistent lookup
         country_normalized = country.lower()
         
-        cursor.execute('''
-            SELECT emotion, confidence, post_ids
-            FROM events
-            WHERE LOWER(country) = ? AND is_analyzed = 1
+        cursor.execute(EMOTION_SUMS_SELECT + '''
+            AND LOWER(country) = ?
+            GROUP BY LOWER(country), emotion
         ''', (country_normalized,))
         
         rows = cursor.fetchall()
@@ -55,27 +65,21 @@ class CountryEmotionAggregator:
         if not rows:
             return None
 
-        # Aggregate emotions and count total posts
-        emotion_totals = defaultdict(float)
+        return self._summarize_events(country_normalized, [row[1:] for row in rows])
+
+    def _summarize_events(self, country, rows):
+        """Average (emotion, confidence_sum, event_count, post_count) rows of one country"""
+        emotion_totals = {}
         event_count = 0
         total_post_count = 0
 
-        for emotion, confidence, post_ids_json in rows:
-            if emotion:
-                emotion_totals[emotion] += confidence
-                event_count += 1
-                # Count actual posts in this event
-                try:
-                    post_ids = json.loads(post_ids_json)
-                    total_post_count += len(post_ids)
-                except (json.JSONDecodeError, TypeError):
-                    pass  # Skip malformed post_ids
-
-        if event_count == 0:
-            return None
-        
+        for emotion, confidence_sum, emotion_events, post_count in rows:
+            emotion_totals[emotion] = confidence_sum or 0.0
+            event_count += emotion_events
+            total_post_count += post_count or 0
+
         # Check if we have any emotions (events might not have emotion set yet)
-        if not emotion_totals:
+        if event_count == 0 or not emotion_totals:
             return None
 
         # Average emotions across events
@@ -83,7 +87,7 @@ class CountryEmotionAggregator:
         top_emotion = max(avg_emotions.items(), key=lambda x: x[1])[0]
 
         return {
-            'country': country_normalized,
+            'country': country,
             'emotions': avg_emotions,
             'top_emotion': top_emotion,
             'total_posts': total_post_count  # Total posts across all events
@@ -94,17 +98,18 @@ class CountryEmotionAggregator:
         conn = db.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT DISTINCT country
-            FROM events
-            WHERE is_analyzed = 1
+        # One grouped query for every country instead of one query per country
+        cursor.execute(EMOTION_SUMS_SELECT + '''
+            GROUP BY LOWER(country), emotion
         ''')
         
-        countries = cursor.fetchall()
+        rows_by_country = defaultdict(list)
+        for country, *sums in cursor.fetchall():
+            rows_by_country[country].append(sums)
 
         results = []
-        for (country,) in countries:
-            agg = self.aggregate_country(country)
+        for country, rows in rows_by_country.items():
+            agg = self._summarize_events(country, rows)
             if agg:
                 results.append(agg)
 
@@ -137,7 +142,7 @@ def aggregate_country(country):
                 VALUES (?, ?, ?, ?)
             ''', (
                 result['country'],
-                json.dumps(result['emotions']),
+                fast_json.dumps(result['emotions']),
                 result['top_emotion'],
                 result['total_posts']
             ))
@@ -156,29 +161,28 @@ def aggregate_all():
     results = aggregator.aggregate_all_countries()
     
     # Store in database with updated timestamp
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    from datetime import datetime
     current_time = datetime.now().isoformat()
     
+    rows = []
     for result in results:
-        try:
-            cursor.execute('''
+        rows.append((
+            result['country'],
+            fast_json.dumps(result['emotions']),
+            result['top_emotion'],
+            result['total_posts'],
+            current_time
+        ))
+    
+    # One prepared statement for every country, committed once
+    try:
+        with db.transaction() as conn:
+            conn.executemany('''
                 INSERT OR REPLACE INTO country_emotions
                 (country, emotions, top_emotion, total_posts, last_updated)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (
-                result['country'],
-                json.dumps(result['emotions']),
-                result['top_emotion'],
-                result['total_posts'],
-                current_time
-            ))
-        except Exception as e:
-            logger.error(f"Error storing aggregation: {e}")
-    
-    conn.commit()
+            ''', rows)
+    except Exception as e:
+        logger.error(f"Error storing aggregations: {e}")
 
     return jsonify({
         'aggregated_countries': len(results),
@@ -215,22 +219,16 @@ def get_country_emotions(country):
         all_items = []
         clustered_events = []  # Only events with 2+ posts
         
-        for event_row in cursor.fetchall():
-            post_ids = json.loads(event_row[3])
+        event_rows = [(event_row, fast_json.loads(event_row[3])) for event_row in cursor.fetchall()]
+        # URLs of every listed event's posts in one query instead of one per event
+        url_by_post = fetch_post_urls(cursor, [post_id for _, post_ids in event_rows for post_id in post_ids])
+        
+        for event_row, post_ids in event_rows:
             # post_count is column 6 (index 5) - guaranteed to exist in query
             post_count = event_row[5]
             
-            # Get URLs from posts - use proper parameterized query and deduplicate
-            placeholders = ','.join('?' * len(post_ids))
-            query = f'SELECT url FROM raw_posts WHERE id IN ({placeholders})'
-            cursor.execute(query, post_ids)
-            # Deduplicate URLs while preserving order
-            urls = []
-            seen = set()
-            for r in cursor.fetchall():
-                if r[0] and r[0] not in seen:
-                    urls.append(r[0])
-                    seen.add(r[0])
+            # Deduplicate URLs while preserving post order
+            urls = list(dict.fromkeys(url_by_post[post_id] for post_id in post_ids if post_id in url_by_post))
             
             item = {
                 'title': event_row[1],
@@ -262,7 +260,7 @@ def get_country_emotions(country):
         
         return jsonify({
             'country': row[0],
-            'emotions': json.loads(row[1]),
+            'emotions': fast_json.loads(row[1]),
             'top_emotion': row[2],
             'total_posts': row[3],
             'last_updated': row[4],
@@ -273,25 +271,29 @@ def get_country_emotions(country):
     return jsonify({'error': 'Country not found'}), 404
 
 
+# The whole /countries response built by SQLite's JSON functions: the stored
+# emotions JSON is embedded as-is instead of being parsed into Python dicts
+# and serialized again, and no per-row Python objects are created
+ALL_COUNTRIES_JSON_SQL = '''
+    SELECT json_object(
+        'countries', json_group_array(json_object(
+            'country', country,
+            'emotions', json(emotions),
+            'top_emotion', top_emotion,
+            'total_posts', total_posts,
+            'last_updated', last_updated
+        )),
+        'total', COUNT(*)
+    )
+    FROM country_emotions
+'''
+
+
 @app.route('/countries', methods=['GET'])
 def get_all_countries():
     """Get all aggregated country emotions"""
-    rows = db.execute_query('''
-        SELECT country, emotions, top_emotion, total_posts, last_updated
-        FROM country_emotions
-    ''')
-
-    results = []
-    for row in rows:
-        results.append({
-            'country': row[0],
-            'emotions': json.loads(row[1]),
-            'top_emotion': row[2],
-            'total_posts': row[3],
-            'last_updated': row[4]
-        })
-
-    return jsonify({'countries': results, 'total': len(results)})
+    payload = db.execute_query(ALL_COUNTRIES_JSON_SQL)[0][0]
+    return Response(payload, mimetype='application/json')
 
 
 @app.route('/timeline/<country>', methods=['GET'])
@@ -10,16 +10,17 @@ import logging
 import os
 import sys
 import time
+import random
 import threading
 import requests
 from pybreaker import CircuitBreaker, CircuitBreakerError
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import json
 from datetime import datetime
 import sqlite3
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
 from database import SharedDatabase
+import fast_json
 from config import DB_PATH
 from metrics import (
     get_metrics, track_request_metrics, service_up,
@@ -71,6 +72,14 @@ aggregator_breaker = CircuitBreaker(fail_max=5, reset_timeout=60, name='aggregat
 # Background processing
 processing_active = False
 processing_thread = None
+last_fetch_time = None  # Wall-clock time of the last successful fetch, for /api/health
+
+# Old posts are cleaned up once per this many seconds
+CLEANUP_INTERVAL_SECONDS = 86400
+
+# Delay after an unexpected pipeline error, doubled per consecutive error
+ERROR_BACKOFF_BASE = 10
+ERROR_BACKOFF_MAX = 60
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)))
@@ -78,22 +87,30 @@ def call_service_with_retry(breaker, url, timeout):
     """Call a service with circuit breaker and retry logic"""
     return breaker.call(requests.post, url, timeout=timeout)
 
+def error_backoff(consecutive_errors: int) -> float:
+    """Exponential backoff with full jitter, capped at ERROR_BACKOFF_MAX seconds"""
+    delay = min(ERROR_BACKOFF_MAX, ERROR_BACKOFF_BASE * 2 ** (consecutive_errors - 1))
+    return random.uniform(delay / 2, delay)
+
+
 def background_processing():
     """Background task to process data pipeline"""
-    global processing_active
-    last_cleanup = datetime.now()
+    global processing_active, last_fetch_time
+    # Monotonic, so clock changes cannot skip or repeat the cleanup
+    last_cleanup = time.monotonic()
+    consecutive_errors = 0
     
     while processing_active:
         try:
             # Cleanup old posts daily (once every 24 hours)
-            if (datetime.now() - last_cleanup).total_seconds() > 86400:  # 24 hours
+            if time.monotonic() - last_cleanup > CLEANUP_INTERVAL_SECONDS:
                 logger.info("🧹 Running daily cleanup of old posts...")
                 try:
                     response = requests.post(f"{DATA_FETCHER_URL}/cleanup", json={}, timeout=30)
                     if response.status_code == 200:
                         result = response.json()
                         logger.info(f"✓ Cleanup: {result.get('deleted_posts', 0)} posts, {result.get('deleted_events', 0)} events removed")
-                    last_cleanup = datetime.now()
+                    last_cleanup = time.monotonic()
                 except Exception as e:
                     logger.error(f"Cleanup error: {e}")
             
@@ -102,6 +119,7 @@ def background_processing():
             try:
                 response = requests.post(f"{DATA_FETCHER_URL}/fetch/next-batch", json={}, timeout=90)
                 if response.status_code == 200:
+                    last_fetch_time = datetime.now()
                     logger.info("✓ Fetched posts")
                 else:
                     logger.warning(f"Data fetcher returned status {response.status_code}")
@@ -191,6 +209,8 @@ def background_processing():
             except requests.exceptions.RequestException as e:
                 logger.error(f"Request error aggregating: {e}")
 
+            consecutive_errors = 0
+            
             # Wait before next cycle
             time.sleep(30)  # 30 seconds for faster data flow
 
@@ -198,8 +218,10 @@ def background_processing():
             logger.info("Background processing interrupted")
             processing_active = False
         except Exception as e:
-            logger.exception(f"Unexpected error in background processing: {e}")
-            time.sleep(10)  # Faster recovery from errors
+            consecutive_errors += 1
+            delay = error_backoff(consecutive_errors)
+            logger.exception(f"Unexpected error in background processing (retrying in {delay:.0f}s): {e}")
+            time.sleep(delay)
 
 
 @app.route('/health', methods=['GET'])
@@ -211,7 +233,6 @@ def health():
 @app.route('/api/health', methods=['GET'])
 def api_health():
     """API health check - frontend compatible"""
-    from datetime import datetime
     try:
         conn = db.get_connection()
         cursor = conn.cursor()
@@ -224,7 +245,7 @@ def api_health():
         'status': 'healthy',
         'demo_mode': False,
         'db_posts': db_posts,
-        'last_fetch': datetime.now().isoformat()
+        'last_fetch': last_fetch_time.isoformat() if last_fetch_time else None
     })
 
 
@@ -248,10 +269,6 @@ def get_emotions():
             logger.error(f"Invalid JSON from aggregator: {e}")
             return jsonify({'error': 'Invalid response format'}), 502
         
-        # Import country coordinates from shared module
-        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
-        from country_coordinates import get_coordinates
-        
         # Transform for frontend - matching expected format
         emotions_data = []
         for country_data in data.get('countries', []):
@@ -303,26 +320,19 @@ def get_stats():
         conn = db.get_connection()
         cursor = conn.cursor()
         
-        # Get stats from events
-        total_countries_row = cursor.execute('SELECT COUNT(DISTINCT country) FROM events WHERE is_analyzed = 1').fetchone()
-        total_countries = total_countries_row[0] if total_countries_row else 0
-        
-        total_events_row = cursor.execute('SELECT COUNT(*) FROM events WHERE is_analyzed = 1').fetchone()
-        total_events = total_events_row[0] if total_events_row else 0
+        # Analyzed event counts per (country, emotion), maintained by triggers
+        rows = cursor.execute('SELECT country, emotion, event_count FROM event_stats').fetchall()
         
-        # Get top emotions
+        total_events = 0
         by_emotion = {}
-        rows = cursor.execute('SELECT emotion, COUNT(*) FROM events WHERE is_analyzed = 1 GROUP BY emotion').fetchall()
-        for emotion, count in rows:
-            if emotion:
-                by_emotion[emotion] = count
-        
-        # Get country breakdown
         by_country = {}
-        country_rows = cursor.execute('SELECT country, COUNT(*) FROM events WHERE is_analyzed = 1 GROUP BY country').fetchall()
-        for country, count in country_rows:
+        for country, emotion, count in rows:
+            total_events += count
+            if emotion:
+                by_emotion[emotion] = by_emotion.get(emotion, 0) + count
             if country:
-                by_country[country] = count
+                by_country[country] = by_country.get(country, 0) + count
+        total_countries = len(by_country)
 
         # Frontend-compatible format
         return jsonify({
@@ -429,7 +439,7 @@ def stream_posts():
                         'emotion': row[5]
                     })
 
-                yield f"data: {json.dumps(events)}\n\n"
+                yield f"data: {fast_json.dumps(events)}\n\n"
                 time.sleep(10)
 
             except GeneratorExit:
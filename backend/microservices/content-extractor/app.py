@@ -8,9 +8,18 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import logging
 import os
+import re
 import sys
+import hashlib
+import heapq
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import lxml.html
+from lxml import etree
 from urllib.parse import urlparse
 from langdetect import detect, LangDetectException
 from deep_translator import GoogleTranslator
@@ -18,8 +27,13 @@ from deep_translator import GoogleTranslator
 # Add shared module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
-from database import SharedDatabase
-from config import DB_PATH
+from database import SharedDatabase, EXTRACTION_IN_PROGRESS, RELEASE_EXTRACTION_CLAIMS_SQL
+from config import (
+    DB_PATH, EXTRACTION_CONNECT_TIMEOUT, EXTRACTION_READ_TIMEOUT, MAX_PAGE_BYTES,
+    FAILED_DOMAIN_MAX_FAILURES, FAILED_DOMAIN_TTL_SECONDS, CONTENT_EXTRACT_WORKERS,
+    TRANSLATION_CACHE_SIZE
+)
+from url_filters import extract_domain, is_social_media, has_non_html_extension
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,6 +45,165 @@ CORS(app)
 # Initialize database
 db = SharedDatabase(DB_PATH)
 
+# Claim and return posts that need extraction OR translation in one statement,
+# so concurrent batches never pick up the same posts
+CLAIM_PENDING_SQL = f'''
+    UPDATE raw_posts
+    SET needs_extraction = {EXTRACTION_IN_PROGRESS}
+    WHERE id IN (
+        SELECT id
+        FROM raw_posts
+        WHERE (needs_extraction = 1 AND link_url IS NOT NULL)
+           OR (needs_extraction = 0 AND link_url IS NULL)
+        LIMIT 100
+    )
+    RETURNING id, text, link_url
+'''
+
+# Hand a claimed post that was not written back to the next batch: posts with a
+# link go back to extraction (1), text-only posts back to translation (0)
+RELEASE_CLAIM_SQL = f'''
+    UPDATE raw_posts
+    SET needs_extraction = ?
+    WHERE id = ? AND needs_extraction = {EXTRACTION_IN_PROGRESS}
+'''
+
+# Processed posts are written back in batches of this size
+UPDATE_BATCH_SIZE = 50
+
+# Posts of a batch are fetched, parsed and translated concurrently
+EXTRACTION_POOL = ThreadPoolExecutor(max_workers=CONTENT_EXTRACT_WORKERS, thread_name_prefix='extract')
+
+UPDATE_PROCESSED_SQL = '''
+    UPDATE raw_posts
+    SET text = ?, needs_extraction = 0
+    WHERE id = ?
+'''
+
+# Shared HTTP session so article downloads reuse pooled connections
+SESSION = requests.Session()
+SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+})
+
+# Elements dropped (with their text) before looking for the article
+BOILERPLATE_TAGS = ('script', 'style', 'nav', 'footer', 'aside')
+
+# Extracted article text is cut to this many characters
+MAX_ARTICLE_CHARS = 1000
+
+# Collapses runs of whitespace in one C-level pass
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Charset parameter of a Content-Type header, and a <meta charset> / http-equiv
+# declaration near the top of a page
+HEADER_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+
+def html_parser_for(content_type: str, body: bytes):
+    """
+    lxml parser decoding body with the page's charset, or None to let lxml
+    read a <meta charset> itself. libxml2 never sees the HTTP headers and
+    falls back to Latin-1 without a meta tag, so the header charset wins,
+    then the page's own declaration, then UTF-8 if the bytes are valid UTF-8.
+    """
+    match = HEADER_CHARSET_RE.search(content_type)
+    if match:
+        try:
+            return lxml.html.HTMLParser(encoding=match.group(1))
+        except LookupError:
+            pass  # Unknown charset name: decide from the body instead
+    
+    if META_CHARSET_RE.search(body[:4096]):
+        return None
+    try:
+        body.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return lxml.html.HTMLParser(encoding='utf-8')
+
+
+def xpath_has_class(name: str) -> str:
+    """XPath condition equivalent to the CSS selector .name"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Common article containers, most specific first
+ARTICLE_CONDITIONS = [
+    'self::article',
+    xpath_has_class('article'),
+    xpath_has_class('post-content'),
+    xpath_has_class('entry-content'),
+    xpath_has_class('content'),
+    "@id = 'article-body'",
+    xpath_has_class('story-body')
+]
+# One compiled XPath finds every candidate in a single walk of the tree;
+# the per-condition expressions rank the candidates by the order above
+ARTICLE_XPATH = etree.XPath('//*[' + ' or '.join(ARTICLE_CONDITIONS) + ']')
+ARTICLE_RANKS = [etree.XPath(f'boolean({condition})') for condition in ARTICLE_CONDITIONS]
+
+
+class TranslatorPool:
+    """
+    Idle GoogleTranslators per source language, shared by all threads and
+    greenlets. GoogleTranslator keeps request parameters on the instance, so
+    a translator is checked out by one caller at a time.
+    """
+
+    def __init__(self):
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self, lang: str):
+        """Lend a GoogleTranslator from lang to English, creating one if none is idle"""
+        with self.lock:
+            idle = self.idle.get(lang)
+            translator = idle.pop() if idle else None
+        if translator is None:
+            translator = GoogleTranslator(source=lang, target='en')
+        try:
+            yield translator
+        finally:
+            with self.lock:
+                self.idle.setdefault(lang, []).append(translator)
+
+
+translator_pool = TranslatorPool()
+
+
+class TranslationCache:
+    """Thread-safe LRU of English texts keyed by a digest of the original"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        with self.lock:
+            english = self.entries.get(key)
+            if english is not None:
+                self.entries.move_to_end(key)
+            return english
+
+    def put(self, key: bytes, english: str):
+        with self.lock:
+            self.entries[key] = english
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+# Reposted titles and texts skip language detection and translation
+translation_cache = TranslationCache(TRANSLATION_CACHE_SIZE)
+
 
 def detect_and_translate(text: str, field_name: str = "text") -> str:
     """
@@ -40,6 +213,20 @@ def detect_and_translate(text: str, field_name: str = "text") -> str:
     if not text or len(text.strip()) < 10:
         return text
     
+    key = translation_cache.key(text)
+    english = translation_cache.get(key)
+    if english is not None:
+        return english
+    
+    english = _detect_and_translate(text, field_name)
+    if english is not None:
+        translation_cache.put(key, english)
+        return english
+    return text
+
+
+def _detect_and_translate(text: str, field_name: str):
+    """Uncached detect_and_translate; None when the text could not be processed"""
     try:
         # Detect language
         lang = detect(text)
@@ -50,123 +237,241 @@ def detect_and_translate(text: str, field_name: str = "text") -> str:
         
         # Translate to English
         logger.info(f"🌐 Translating {field_name} from {lang} to English ({len(text)} chars)")
-        translator = GoogleTranslator(source=lang, target='en')
-        
-        # Split into chunks if too long (Google Translate limit ~5000 chars)
-        max_chunk = 4500
-        if len(text) <= max_chunk:
-            translated = translator.translate(text)
-        else:
-            # Split by sentences/paragraphs
-            chunks = []
-            current_chunk = ""
-            for sentence in text.split('. '):
-                if len(current_chunk) + len(sentence) < max_chunk:
-                    current_chunk += sentence + '. '
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                    current_chunk = sentence + '. '
-            if current_chunk:
-                chunks.append(current_chunk)
+        with translator_pool.checkout(lang) as translator:
+            # Split into chunks if too long (Google Translate limit ~5000 chars)
+            max_chunk = 4500
+            if len(text) <= max_chunk:
+                translated = translator.translate(text)
+            else:
+                # Split by sentences/paragraphs
+                chunks = []
+                current_chunk = ""
+                for sentence in text.split('. '):
+                    if len(current_chunk) + len(sentence) < max_chunk:
+                        current_chunk += sentence + '. '
+                    else:
+                        if current_chunk:
+                            chunks.append(current_chunk)
+                        current_chunk = sentence + '. '
+                if current_chunk:
+                    chunks.append(current_chunk)
             
-            # Translate each chunk
-            translated_chunks = [translator.translate(chunk) for chunk in chunks]
-            translated = ' '.join(translated_chunks)
+                # Translate each chunk
+                translated_chunks = [translator.translate(chunk) for chunk in chunks]
+                translated = ' '.join(translated_chunks)
         
         logger.info(f"✓ Translated {field_name}: {lang} → en")
         return translated
         
     except LangDetectException:
-        # Can't detect language, return original
+        # Can't detect language, keep the original
         logger.warning(f"⚠️  Could not detect language for {field_name}")
-        return text
+        return None
     except Exception as e:
         logger.error(f"Translation error for {field_name}: {e}")
-        return text  # Return original on error
+        return None  # Keep the original on error, uncached so it is retried
+
+
+class FailedDomainCache:
+    """
+    Counts recent extraction failures per domain.
+    Domains that keep failing (paywalls, JS-only sites, 403s, timeouts) are
+    skipped until their failures are older than the TTL.
+    """
+
+    def __init__(self, max_failures=3, ttl_seconds=3600, max_domains=10000):
+        self.max_failures = max_failures
+        self.ttl_seconds = ttl_seconds
+        self.max_domains = max_domains
+        self.failures = {}  # domain -> (failure_count, expires_at)
+        # Min-heap of (expires_at, domain), so expiry only touches expired
+        # entries; items whose domain was reset or cleared are skipped when popped
+        self.expiry_heap = []
+        self.lock = threading.Lock()
+
+    def is_blocked(self, domain: str) -> bool:
+        """Check whether a domain failed too often within the TTL"""
+        with self.lock:
+            self._expire(time.monotonic())
+            entry = self.failures.get(domain)
+            return entry is not None and entry[0] >= self.max_failures
+
+    def record_failure(self, domain: str):
+        """Count a failed extraction for a domain"""
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            entry = self.failures.get(domain)
+            if entry is None:
+                expires_at = now + self.ttl_seconds
+                self.failures[domain] = (1, expires_at)
+                heapq.heappush(self.expiry_heap, (expires_at, domain))
+            else:
+                self.failures[domain] = (entry[0] + 1, entry[1])
+            # Over capacity: drop the domains whose window started first
+            while len(self.failures) > self.max_domains:
+                self._pop_oldest()
+
+    def record_success(self, domain: str):
+        """Forget past failures of a domain that works again"""
+        with self.lock:
+            self.failures.pop(domain, None)
+
+    def _expire(self, now: float):
+        """Drop domains whose failure window has passed"""
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            self._pop_oldest()
+
+    def _pop_oldest(self):
+        """Remove the heap's earliest entry and its domain, if still current"""
+        expires_at, domain = heapq.heappop(self.expiry_heap)
+        entry = self.failures.get(domain)
+        if entry is not None and entry[1] == expires_at:
+            del self.failures[domain]
 
 
-def extract_article_content(url: str) -> dict:
+failed_domains = FailedDomainCache(FAILED_DOMAIN_MAX_FAILURES, FAILED_DOMAIN_TTL_SECONDS)
+
+
+def article_rank(element) -> int:
+    """Position of the first ARTICLE_CONDITIONS entry matching element"""
+    return next(rank for rank, matches in enumerate(ARTICLE_RANKS) if matches(element))
+
+
+# (URL, translate) -> Future of the extraction currently running for it, so concurrent
+# requests for the same link (crossposts, /extract during a batch) share one fetch
+INFLIGHT_EXTRACTIONS = {}
+INFLIGHT_LOCK = threading.Lock()
+
+
+def extract_article_content(url: str, translate: bool = True) -> dict:
     """
     Extract main content from article URL.
-    Skips social media links (require login).
+    Waits for an identical extraction already in progress instead of repeating it.
+    """
+    key = (url, translate)
+    with INFLIGHT_LOCK:
+        future = INFLIGHT_EXTRACTIONS.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            INFLIGHT_EXTRACTIONS[key] = future
+    
+    if not owner:
+        return future.result()
+    
+    try:
+        result = fetch_article_content(url, translate)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with INFLIGHT_LOCK:
+            INFLIGHT_EXTRACTIONS.pop(key, None)
+
+
+def fetch_article_content(url: str, translate: bool = True) -> dict:
+    """
+    Download and extract main content from article URL.
+    Skips social media links (require login) and domains that keep failing.
+    translate=False returns the title and text untranslated, for callers
+    that translate the combined text themselves.
     Returns: {text, title, success}
     """
+    domain = extract_domain(url)
+    
     # Skip social media (safety check)
-    social_media = ['twitter.com', 'x.com', 'facebook.com', 'instagram.com', 'tiktok.com',
-                   'linkedin.com', 'reddit.com', 'youtube.com', 'youtu.be']
-    if any(sm in url.lower() for sm in social_media):
+    if is_social_media(domain):
         logger.info(f"⏭️ Skipping social media URL: {url[:50]}")
         return {'success': False, 'error': 'Social media URL (requires login)'}
     
+    # Files are rejected from the URL alone, before any request is made
+    if has_non_html_extension(url):
+        return {'success': False, 'error': 'Non-HTML content (file URL)'}
+    
+    if failed_domains.is_blocked(domain):
+        return {'success': False, 'error': f'Domain {domain} keeps failing (skipped)'}
+    
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        # Stream the response so headers can be checked before the body is read,
+        # and never hold more than MAX_PAGE_BYTES of a page in memory
+        with SESSION.get(url, timeout=(EXTRACTION_CONNECT_TIMEOUT, EXTRACTION_READ_TIMEOUT),
+                         stream=True) as response:
+            response.raise_for_status()
+            
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type.lower():
+                return {'success': False, 'error': f"Non-HTML content ({content_type.split(';')[0]})"}
+            
+            content_length = response.headers.get('Content-Length', '')
+            if content_length.isdigit() and int(content_length) > MAX_PAGE_BYTES:
+                return {'success': False, 'error': 'Page too large'}
+            
+            body = response.raw.read(MAX_PAGE_BYTES, decode_content=True)
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        if not body.strip():
+            failed_domains.record_failure(domain)
+            return {'success': False, 'error': 'No content found'}
         
-        # Remove script and style elements
-        for script in soup(['script', 'style', 'nav', 'footer', 'aside']):
-            script.decompose()
+        # Work on the lxml tree directly; it parses in C. lxml cannot see the
+        # response headers, so pick the charset for it (see html_parser_for)
+        tree = lxml.html.document_fromstring(body, parser=html_parser_for(content_type, body))
         
-        # Try to find article content
-        article = None
+        # Remove script, style and page chrome
+        etree.strip_elements(tree, *BOILERPLATE_TAGS, with_tail=False)
         
-        # Common article containers
-        for selector in [
-            'article',
-            {'class': 'article'},
-            {'class': 'post-content'},
-            {'class': 'entry-content'},
-            {'class': 'content'},
-            {'id': 'article-body'},
-            {'class': 'story-body'}
-        ]:
-            if isinstance(selector, str):
-                article = soup.find(selector)
-            else:
-                article = soup.find(attrs=selector)
-            if article:
-                break
+        # Try to find article content: first match of the highest ranked container
+        candidates = ARTICLE_XPATH(tree)
+        article = min(candidates, key=article_rank) if candidates else None
         
-        # Fallback: use main or body
-        if not article:
-            article = soup.find('main') or soup.find('body')
-        
-        if not article:
-            return {'success': False, 'error': 'No content found'}
+        # Fallback: use main or the whole document
+        if article is None:
+            article = tree.find('.//main')
+        if article is None:
+            article = tree
         
         # Extract title
         title = None
-        h1 = soup.find('h1')
-        if h1:
-            title = h1.get_text(strip=True)
+        h1 = tree.find('.//h1')
+        if h1 is not None:
+            title = h1.text_content().strip()
         if not title:
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text(strip=True)
+            title = (tree.findtext('.//title') or '').strip() or None
         
-        # Extract paragraphs
-        paragraphs = article.find_all('p')
-        text_parts = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50]
+        # Extract paragraphs, stopping once there is enough text to fill the limit
+        text_parts = []
+        collected = 0
+        for p in article.iter('p'):
+            paragraph = p.text_content().strip()
+            if len(paragraph) > 50:
+                text_parts.append(paragraph)
+                collected += len(paragraph) + 1
+                if collected > MAX_ARTICLE_CHARS * 2:
+                    break
         
-        extracted_text = ' '.join(text_parts)
+        # Bound the regex work before normalizing whitespace
+        raw_text = ' '.join(text_parts)
+        extracted_text = WHITESPACE_RE.sub(' ', raw_text[:MAX_ARTICLE_CHARS * 2])
         
-        # Limit to 1000 characters
-        if len(extracted_text) > 1000:
-            extracted_text = extracted_text[:1000] + '...'
+        # Limit to MAX_ARTICLE_CHARS characters
+        if len(extracted_text) > MAX_ARTICLE_CHARS or len(raw_text) > MAX_ARTICLE_CHARS * 2:
+            extracted_text = extracted_text[:MAX_ARTICLE_CHARS] + '...'
         
         if not extracted_text or len(extracted_text) < 100:
+            failed_domains.record_failure(domain)
             return {'success': False, 'error': 'Insufficient content'}
         
+        failed_domains.record_success(domain)
         logger.info(f"✓ Extracted {len(extracted_text)} chars from {urlparse(url).netloc}")
         
         # Translate title and content to English
-        title_en = detect_and_translate(title or '', 'title')
-        content_en = detect_and_translate(extracted_text, 'blog content')
+        if translate:
+            title_en = detect_and_translate(title or '', 'title')
+            content_en = detect_and_translate(extracted_text, 'blog content')
+        else:
+            title_en, content_en = title or '', extracted_text
         
         return {
             'success': True,
@@ -176,8 +481,10 @@ def extract_article_content(url: str) -> dict:
         }
         
     except requests.Timeout:
+        failed_domains.record_failure(domain)
         return {'success': False, 'error': 'Timeout'}
     except requests.RequestException as e:
+        failed_domains.record_failure(domain)
         return {'success': False, 'error': f'Request failed: {str(e)}'}
     except Exception as e:
         return {'success': False, 'error': f'Extraction failed: {str(e)}'}
@@ -202,56 +509,105 @@ def extract_url():
     return jsonify(result)
 
 
+def flush_updates(updates: list) -> int:
+    """
+    Write (text, post_id) updates in a single transaction.
+    Returns the number of posts written.
+    """
+    if not updates:
+        return 0
+    
+    conn = db.get_connection()
+    try:
+        conn.executemany(UPDATE_PROCESSED_SQL, updates)
+        conn.commit()
+        logger.info(f"✓ Saved {len(updates)} processed posts")
+        return len(updates)
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error updating {len(updates)} posts: {e}")
+        return 0
+
+
+def release_claims(unwritten: dict):
+    """Release claimed posts (post_id -> link_url) whose results were not stored"""
+    if not unwritten:
+        return
+    
+    conn = db.get_connection()
+    try:
+        conn.executemany(RELEASE_CLAIM_SQL, [
+            (1 if link_url else 0, post_id) for post_id, link_url in unwritten.items()
+        ])
+        conn.commit()
+        logger.warning(f"⚠️  Released {len(unwritten)} unprocessed posts for retry")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error releasing {len(unwritten)} claimed posts: {e}")
+
+
+def enrich_post(row) -> tuple:
+    """Extract and translate one claimed post, returning (final_text, post_id)"""
+    post_id, original_text, link_url = row
+    
+    final_text = original_text
+    
+    # Step 1: Extract blog content if needed
+    if link_url:
+        # Untranslated: the combined text is translated once below
+        result = extract_article_content(link_url, translate=False)
+        
+        if result['success']:
+            # Combine title + blog content
+            final_text = f"{result.get('title', original_text)}. {result['text']}"
+            logger.info(f"✓ Extracted blog content for post {post_id}")
+        else:
+            logger.warning(f"⚠️  Failed to extract {link_url}: {result.get('error')}")
+    
+    # Step 2: Translate the combined text to English
+    # Translate the entire text at once to maintain context and reduce API calls
+    final_text = detect_and_translate(final_text, 'post text')
+    
+    return final_text, post_id
+
+
 @app.route('/process/pending', methods=['POST'])
 def process_pending():
     """Process posts that need content extraction and translation"""
     
-    # Get posts that need extraction OR translation
-    rows = db.execute_query('''
-        SELECT id, text, link_url
-        FROM raw_posts
-        WHERE (needs_extraction = 1 AND link_url IS NOT NULL)
-           OR (needs_extraction = 0 AND link_url IS NULL)
-        LIMIT 100
-    ''')
+    # Claim posts that need extraction OR translation
+    conn = db.get_connection()
+    rows = conn.execute(CLAIM_PENDING_SQL).fetchall()
+    conn.commit()
     
     processed = 0
     enriched = 0
+    updates = []
+    # Claimed posts not yet written back; released in the finally below so a
+    # failed write or an error mid-batch never leaves them claimed
+    unwritten = {post_id: link_url for post_id, _, link_url in rows}
     
-    for row in rows:
-        post_id, original_text, link_url = row
-        
-        final_text = original_text
-        
-        # Step 1: Extract blog content if needed
-        if link_url:
-            result = extract_article_content(link_url)
-            
-            if result['success']:
-                # Combine title + blog content
-                final_text = f"{result.get('title', original_text)}. {result['text']}"
-                logger.info(f"✓ Extracted blog content for post {post_id}")
-            else:
-                logger.warning(f"⚠️  Failed to extract {link_url}: {result.get('error')}")
-        
-        # Step 2: Translate the combined text to English
-        # Translate the entire text at once to maintain context and reduce API calls
-        final_text = detect_and_translate(final_text, 'post text')
-        
-        # Update database with translated content
-        try:
-            db.execute_commit('''
-                UPDATE raw_posts
-                SET text = ?, needs_extraction = 0
-                WHERE id = ?
-            ''', (final_text, post_id))
+    def flush():
+        written = flush_updates(updates)
+        if written == len(updates):
+            for _, post_id in updates:
+                unwritten.pop(post_id, None)
+        updates.clear()
+        return written
+    
+    try:
+        # Results come back in claim order while the pool works ahead
+        for update in EXTRACTION_POOL.map(enrich_post, rows):
+            # Queue the translated content; one commit per batch instead of per post
+            updates.append(update)
+            if len(updates) >= UPDATE_BATCH_SIZE:
+                enriched += flush()
             
-            enriched += 1
-            logger.info(f"✓ Processed and translated post {post_id}")
-        except Exception as e:
-            logger.error(f"Error updating post {post_id}: {e}")
+            processed += 1
         
-        processed += 1
+        enriched += flush()
+    finally:
+        release_claims(unwritten)
     
     return jsonify({
         'processed': processed,
@@ -264,13 +620,12 @@ def process_pending():
 def get_stats():
     """Get extraction statistics"""
     try:
-        pending = db.execute_query('''
-            SELECT COUNT(*) FROM raw_posts WHERE needs_extraction = 1
-        ''')[0][0]
-        
-        total_links = db.execute_query('''
-            SELECT COUNT(*) FROM raw_posts WHERE post_type = 'link'
-        ''')[0][0]
+        # post_type is not indexed, so count both in the one scan it needs
+        pending, total_links = db.execute_query('''
+            SELECT COALESCE(SUM(needs_extraction = 1), 0),
+                   COALESCE(SUM(post_type = 'link'), 0)
+            FROM raw_posts
+        ''')[0]
         
         return jsonify({
             'pending_extraction': pending,
@@ -281,5 +636,9 @@ def get_stats():
 
 
 if __name__ == '__main__':
+    # Release posts claimed by a previous run that stopped mid-batch
+    # (under gunicorn this runs once in the master, see gunicorn.conf.py)
+    db.execute_commit(RELEASE_EXTRACTION_CLAIMS_SQL)
+    
     port = int(os.getenv('PORT', 5007))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for the Content Extractor
+Extraction is network-bound, so gevent workers serve many requests each
+Run from this directory: gunicorn app:app
+"""
+
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from config import DB_PATH
+from database import RELEASE_EXTRACTION_CLAIMS_SQL
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5007')}"
+worker_class = 'gevent'
+workers = int(os.getenv('CONTENT_EXTRACTOR_WORKERS', '4'))
+worker_connections = 1000
+timeout = 180  # A /process/pending batch may take up to the gateway's 120s timeout
+
+
+def on_starting(server):
+    """Release claims left by a previous run once, before any worker starts"""
+    # A plain connection, closed before forking, so no worker inherits it
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute(RELEASE_EXTRACTION_CLAIMS_SQL)
+        conn.commit()
@@ -8,16 +8,18 @@ from flask_cors import CORS
 import praw
 import logging
 import os
+import re
 import sys
 import time
 from datetime import datetime, timedelta
 import threading
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add shared module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
-from database import SharedDatabase
+from database import SharedDatabase, INSERT_RAW_POST_SQL
 from models import Post
 from config import (
     REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT,
@@ -25,6 +27,7 @@ from config import (
     ALL_COUNTRIES, DB_PATH, DATA_FETCH_WORKERS, REDDIT_FETCH_LIMIT,
     SUBREDDITS_BY_COUNTRY
 )
+from url_filters import extract_domain, classify_domain
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -97,67 +100,94 @@ reddit = praw.Reddit(
 )
 logger.info("✓ Reddit API connected")
 
+# praw.Reddit is not thread-safe, so each fetch worker keeps its own client.
+# The workers live as long as the service, so a client's OAuth token and
+# keep-alive HTTPS connections are reused by every later batch.
+FETCH_POOL = ThreadPoolExecutor(max_workers=DATA_FETCH_WORKERS, thread_name_prefix='fetch')
+_thread_reddit = threading.local()
+
+
+def get_thread_reddit():
+    """Return this thread's Reddit client, created on first use"""
+    client = getattr(_thread_reddit, 'client', None)
+    if client is None:
+        client = _thread_reddit.client = praw.Reddit(
+            client_id=REDDIT_CLIENT_ID,
+            client_secret=REDDIT_CLIENT_SECRET,
+            user_agent=REDDIT_USER_AGENT
+        )
+    return client
+
 
 def get_country_region(country: str) -> str:
     """Get region for a country"""
     return COUNTRY_TO_REGION.get(country.lower(), "worldnews")
 
 
+def get_country_subreddits(country: str) -> list:
+    """Country-specific subreddits first, then the region's, without duplicates"""
+    # Regional subreddits add broader coverage; dict.fromkeys keeps the first
+    # occurrence in order with O(1) membership checks instead of list scans
+    country_subs = SUBREDDITS_BY_COUNTRY.get(country.lower(), [])
+    regional_subs = REGION_SUBREDDITS.get(get_country_region(country), ["worldnews", "news"])
+    return list(dict.fromkeys([*country_subs, *regional_subs]))
+
+
 def search_regional_subreddits(country: str, limit: int = 50, reddit_instance=None) -> list:
     """
     Search Reddit for posts about a country.
     Only processes TEXT and LINK (blog/news) posts.
     Ignores: images, videos, galleries, social media.
     """
-    posts = []
+    # Link posts (news) are kept apart so they can be put first without
+    # inserting at the front of a list, which shifts every element
+    link_posts = []
+    other_posts = []
     seen_ids = set()
+    kept_per_subreddit = Counter()
 
     date_threshold = datetime.now() - timedelta(days=MAX_POST_AGE_DAYS)
     date_threshold_timestamp = date_threshold.timestamp()
 
-    # Combine country-specific and regional subreddits for comprehensive coverage
-    country_lower = country.lower()
-    all_subs = []
-    
-    # Add country-specific subreddits first (if available)
-    if country_lower in SUBREDDITS_BY_COUNTRY:
-        all_subs.extend(SUBREDDITS_BY_COUNTRY[country_lower])
-    
-    # Add regional subreddits for broader coverage
-    region = get_country_region(country)
-    regional_subs = REGION_SUBREDDITS.get(region, ["worldnews", "news"])
-    # Add regional subs that aren't already in the list
-    for sub in regional_subs:
-        if sub not in all_subs:
-            all_subs.append(sub)
-    
     # Use all available subreddits
-    subreddits = all_subs
+    subreddits = get_country_subreddits(country)
     # Decide per-subreddit limit based on overall limit and configured fetch limit
     per_sub_limit = max(10, int(min(REDDIT_FETCH_LIMIT, limit) / max(1, len(subreddits))))
 
+    # Country-name subreddits (r/Morocco, r/france, r/portugal etc) are read
+    # newest-first without a keyword. All the others are searched for the country
+    # in one multireddit query (r/europe+worldnews+news) instead of one request each.
+    # Each subreddit still keeps at most per_sub_limit posts from that query, so a
+    # busy one cannot take the whole quota; a quiet one only gets posts that make
+    # it into the combined newest results, where it used to get its own search.
+    country_key = country.lower().replace(' ', '')
+    new_subs = [sub for sub in subreddits if sub.lower() == country_key]
+    search_subs = [sub for sub in subreddits if sub.lower() != country_key]
+    queries = [(sub, False, per_sub_limit) for sub in new_subs]
+    if search_subs:
+        queries.append(('+'.join(search_subs), True, per_sub_limit * len(search_subs)))
+
+    # If a reddit_instance is provided (per-thread), use it; otherwise fall back
+    local_reddit = reddit_instance if reddit_instance is not None else reddit
+
     try:
-        for subreddit_name in subreddits:
+        # queries may grow while looping (multireddit fallback below)
+        for subreddit_name, keyword_search, query_limit in queries:
             try:
-                # If a reddit_instance is provided (per-thread), use it; otherwise fall back
-                local_reddit = reddit_instance if reddit_instance is not None else reddit
                 subreddit = local_reddit.subreddit(subreddit_name)
                 
                 # Add small delay to reduce rate limiting (429 errors)
                 time.sleep(0.5)
                 
-                # For country-name subreddits (r/Morocco, r/france, r/portugal etc), 
-                # fetch newest posts directly without keyword search
-                if subreddit_name.lower() == country.lower().replace(' ', ''):
-                    search_results = subreddit.new(limit=per_sub_limit)
-                else:
-                    # For other subreddits, search by country keyword
+                if keyword_search:
                     search_results = subreddit.search(
                         country,
-                        limit=per_sub_limit,
+                        limit=query_limit,
                         time_filter='month',
                         sort='new'
                     )
+                else:
+                    search_results = subreddit.new(limit=query_limit)
 
                 for submission in search_results:
                     if submission.created_utc < date_threshold_timestamp:
@@ -167,30 +197,67 @@ def search_regional_subreddits(country: str, limit: int = 50, reddit_instance=No
                         continue
                     seen_ids.add(submission.id)
 
+                    source = str(getattr(submission.subreddit, 'display_name', subreddit_name)).lower()
+                    if kept_per_subreddit[source] >= per_sub_limit:
+                        continue
+
                     # Classify post type and extract content
                     post_data = classify_and_extract_post(submission, country)
                     
                     if post_data:  # Only add if we got valid data
-                        # Prioritize link posts (news) by inserting at front
+                        kept_per_subreddit[source] += 1
                         if post_data.get('post_type') == 'link':
-                            posts.insert(0, post_data)
+                            link_posts.append(post_data)
                         else:
-                            posts.append(post_data)
+                            other_posts.append(post_data)
 
-                        if len(posts) >= limit:
+                        if len(link_posts) + len(other_posts) >= limit:
                             break
 
             except Exception as e:
                 logger.warning(f"Error searching r/{subreddit_name}: {e}")
+                # One banned or private subreddit fails the whole multireddit;
+                # queue its members one by one so the others are still searched
+                if '+' in subreddit_name:
+                    queries.extend((sub, True, per_sub_limit) for sub in subreddit_name.split('+'))
                 continue
 
-            if len(posts) >= limit:
+            # Stop querying further subreddits once the limit is reached
+            if len(link_posts) + len(other_posts) >= limit:
                 break
 
     except Exception as e:
         logger.error(f"Error fetching posts for {country}: {e}")
 
-    return posts
+    # Prioritize link posts (news), newest found first as before
+    link_posts.reverse()
+    return link_posts + other_posts
+
+
+# Post classification patterns, compiled once instead of on every submission
+URL_IN_TEXT_RE = re.compile(r'https?://[^\s]+')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg')
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov')
+
+
+def _post_record(submission, country: str, text: str, post_type: str,
+                 media_url: str = None, link_url: str = None, needs_extraction: int = 0) -> dict:
+    """Build the raw_posts record for a submission from its listing fields"""
+    author = getattr(submission, 'author', None)
+    return {
+        'text': text,
+        'country': country,
+        'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
+        'post_id': submission.id,
+        'post_type': post_type,
+        'media_url': media_url,
+        'link_url': link_url,
+        'needs_extraction': needs_extraction,
+        'source': getattr(submission, 'domain', None),
+        'url': getattr(submission, 'url', None),
+        'author': getattr(author, 'name', None),
+        'score': getattr(submission, 'score', 0)
+    }
 
 
 def classify_and_extract_post(submission, country: str) -> dict:
@@ -208,162 +275,57 @@ def classify_and_extract_post(submission, country: str) -> dict:
     # Accept ALL languages - translation will happen in content-extractor
     # No more filtering based on Latin characters
     
+    # Classify the link host once: 'social', 'blog' or None. Social media wins
+    # over news/blog so those links are never flagged for extraction.
+    category = None
+    
     # Early detection: if this is an external news/blog URL, return link immediately
     try:
-        blog_domains_early = ['bbc.', 'cnn.', 'theguardian.', 'nytimes.', 'reuters.', 'aljazeera.',
-                              'france24.', 'dw.', 'lemonde.', 'elpais.', 'folha.', 'globo.',
-                              'timesofindia.', 'ndtv.', 'thehindu.', 'news.', 'blog.', 'medium.',
-                              'bbc.com', 'cnn.com', 'bloomberg.', 'washingtonpost.']
-        if url and any(domain in url.lower() for domain in blog_domains_early) and not submission.is_self:
-            return {
-                'text': title,
-                'country': country,
-                'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-                'post_id': submission.id,
-                'post_type': 'link',
-                'media_url': None,
-                'link_url': url,
-                'needs_extraction': 1,
-                'source': getattr(submission, 'domain', None),
-                'url': url,
-                'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-                'score': getattr(submission, 'score', 0)
-            }
+        category = classify_domain(extract_domain(url))
+        if url and category == 'blog' and not submission.is_self:
+            return _post_record(submission, country, title, 'link', link_url=url, needs_extraction=1)
     except Exception:
         pass
     
     # TEXT POST: Has selftext (Reddit self-post)
     if submission.is_self and selftext:
-        # Check if text contains external blog links
-        import re
-        urls_in_text = re.findall(r'https?://[^\s]+', selftext)
-        
-        # Blog domains to extract
-        blog_domains = ['bbc.', 'cnn.', 'theguardian.', 'nytimes.', 'reuters.', 'aljazeera.',
-                       'france24.', 'dw.', 'lemonde.', 'elpais.', 'folha.', 'globo.',
-                       'timesofindia.', 'ndtv.', 'thehindu.', 'news.', 'blog.', 'medium.',
-                       'bbc.com', 'cnn.com', 'bloomberg.', 'washingtonpost.']
-        
-        for found_url in urls_in_text:
-            if any(domain in found_url.lower() for domain in blog_domains):
+        # Check if text contains external blog links (lazily, stopping at the first)
+        for match in URL_IN_TEXT_RE.finditer(selftext):
+            found_url = match.group()
+            if classify_domain(extract_domain(found_url)) == 'blog':
                 # Text post with blog link - extract the blog content
                 logger.info(f"📰 Text with blog link: {found_url[:50]}")
-                return {
-                    'text': title,
-                    'country': country,
-                    'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-                    'post_id': submission.id,
-                    'post_type': 'link',
-                    'media_url': None,
-                    'link_url': found_url,
-                    'needs_extraction': 1,
-                    'source': getattr(submission, 'domain', None),
-                    'url': getattr(submission, 'url', None),
-                    'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-                    'score': getattr(submission, 'score', 0)
-                }
+                return _post_record(submission, country, title, 'link', link_url=found_url, needs_extraction=1)
         
         # Pure text post
         combined_text = f"{title}. {selftext[:500]}".strip()
-        return {
-            'text': combined_text,
-            'country': country,
-            'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-            'post_id': submission.id,
-            'post_type': 'text',
-            'media_url': None,
-            'link_url': None,
-            'needs_extraction': 0,
-            'source': getattr(submission, 'domain', None),
-            'url': getattr(submission, 'url', None),
-            'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-            'score': getattr(submission, 'score', 0)
-        }
+        return _post_record(submission, country, combined_text, 'text')
     
     # IGNORE: Image posts (even with text)
-    if any(url.endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']):
+    if url.endswith(IMAGE_EXTENSIONS):
         # Image post - still return minimal metadata for tracking
-        return {
-            'text': title,
-            'country': country,
-            'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-            'post_id': submission.id,
-            'post_type': 'image',
-            'media_url': url,
-            'link_url': None,
-            'needs_extraction': 0,
-            'source': getattr(submission, 'domain', None),
-            'url': getattr(submission, 'url', None),
-            'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-            'score': getattr(submission, 'score', 0)
-        }
+        return _post_record(submission, country, title, 'image', media_url=url)
     
     # IGNORE: Video posts
-    if 'v.redd.it' in url or any(url.endswith(ext) for ext in ['.mp4', '.webm', '.mov']):
+    if 'v.redd.it' in url or url.endswith(VIDEO_EXTENSIONS):
         # Video post - track minimal metadata
-        return {
-            'text': title,
-            'country': country,
-            'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-            'post_id': submission.id,
-            'post_type': 'video',
-            'media_url': url,
-            'link_url': None,
-            'needs_extraction': 0,
-            'source': getattr(submission, 'domain', None),
-            'url': getattr(submission, 'url', None),
-            'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-            'score': getattr(submission, 'score', 0)
-        }
+        return _post_record(submission, country, title, 'video', media_url=url)
     
     # IGNORE: Gallery posts
     if hasattr(submission, 'is_gallery') and submission.is_gallery:
         return None
     
     # IGNORE: Social media links (require login, no value)
-    social_media = ['twitter.com', 'x.com', 'facebook.com', 'instagram.com', 'tiktok.com',
-                   'linkedin.com', 'reddit.com', 'youtube.com', 'youtu.be']
-    if any(sm in url.lower() for sm in social_media):
+    if category == 'social':
         # Still insert metadata for tracking but mark as ignored for extraction
-        return {
-            'text': title,
-            'country': country,
-            'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-            'post_id': submission.id,
-            'post_type': 'social',
-            'media_url': None,
-            'link_url': url,
-            'needs_extraction': 0,
-            'source': getattr(submission, 'domain', None),
-            'url': getattr(submission, 'url', None),
-            'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-            'score': getattr(submission, 'score', 0)
-        }
+        return _post_record(submission, country, title, 'social', link_url=url)
     
     # LINK POST: External blog/news URL
-    blog_domains = ['bbc.', 'cnn.', 'theguardian.', 'nytimes.', 'reuters.', 'aljazeera.',
-                   'france24.', 'dw.', 'lemonde.', 'elpais.', 'folha.', 'globo.',
-                   'timesofindia.', 'ndtv.', 'thehindu.', 'news.', 'blog.', 'medium.',
-                   'bbc.com', 'cnn.com', 'bloomberg.', 'washingtonpost.']
-    
     # If URL points to a blog domain, extract regardless of permalink
     if url:
-        if any(domain in url.lower() for domain in blog_domains):
+        if category == 'blog':
             logger.info(f"📰 Link post: {url[:50]}")
-            return {
-                'text': title,
-                'country': country,
-                'timestamp': datetime.fromtimestamp(submission.created_utc).isoformat(),
-                'post_id': submission.id,
-                'post_type': 'link',
-                'media_url': None,
-                'link_url': url,
-                'needs_extraction': 1,
-                'source': getattr(submission, 'domain', None),
-                'url': getattr(submission, 'url', None),
-                'author': getattr(submission.author, 'name', None) if hasattr(submission, 'author') else None,
-                'score': getattr(submission, 'score', 0)
-            }
+            return _post_record(submission, country, title, 'link', link_url=url, needs_extraction=1)
     
     # FALLBACK: Skip everything else
     return None
@@ -372,11 +334,7 @@ def classify_and_extract_post(submission, country: str) -> dict:
 def store_post(post_data: dict):
     """Store a post in the database"""
     try:
-        db.execute_commit('''
-            INSERT OR IGNORE INTO raw_posts 
-            (id, text, country, timestamp, source, url, author, score, post_type, media_url, link_url, needs_extraction)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        db.execute_commit(INSERT_RAW_POST_SQL, (
             post_data['post_id'], post_data['text'], post_data['country'],
             post_data['timestamp'], post_data.get('source'),
             post_data.get('url'), post_data.get('author'), post_data.get('score', 0),
@@ -504,33 +462,26 @@ def fetch_next_batch():
     all_posts = []
     if is_country_batch:
         # Parallel fetch per country
-        workers = min(len(batch), DATA_FETCH_WORKERS)
         def _fetch_country(country):
             try:
-                # Create a local Reddit instance for thread-safety
-                local_reddit = praw.Reddit(
-                    client_id=REDDIT_CLIENT_ID,
-                    client_secret=REDDIT_CLIENT_SECRET,
-                    user_agent=REDDIT_USER_AGENT
-                )
-                posts = search_regional_subreddits(country, limit=REDDIT_FETCH_LIMIT, reddit_instance=local_reddit)
+                posts = search_regional_subreddits(country, limit=REDDIT_FETCH_LIMIT,
+                                                   reddit_instance=get_thread_reddit())
                 stored = store_raw_posts(posts)
                 return country, len(posts), stored, posts
             except Exception as exc:
                 logger.exception(f"Error in thread fetching {country}: {exc}")
                 return country, 0, 0, []
 
-        with ThreadPoolExecutor(max_workers=workers) as ex:
-            futures = {ex.submit(_fetch_country, country): country for country in batch}
-            for fut in as_completed(futures):
-                country_name = futures[fut]
-                try:
-                    country, fetched, stored, posts = fut.result()
-                    results[country] = {'fetched': fetched, 'stored': stored}
-                    all_posts.extend(posts)
-                except Exception as e:
-                    logger.error(f"Failed fetching for {country_name}: {e}")
-                    results[country_name] = {'fetched': 0, 'stored': 0}
+        futures = {FETCH_POOL.submit(_fetch_country, country): country for country in batch}
+        for fut in as_completed(futures):
+            country_name = futures[fut]
+            try:
+                country, fetched, stored, posts = fut.result()
+                results[country] = {'fetched': fetched, 'stored': stored}
+                all_posts.extend(posts)
+            except Exception as e:
+                logger.error(f"Failed fetching for {country_name}: {e}")
+                results[country_name] = {'fetched': 0, 'stored': 0}
     else:
         # rotation returned a list of posts directly
         all_posts = batch
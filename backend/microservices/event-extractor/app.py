@@ -6,20 +6,24 @@ Groups related posts by country into thematic events with titles and description
 from flask import Flask, jsonify, request
 import sys
 import os
-import json
+import re
+import logging
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+import heapq
 import numpy as np
 
 # Add shared directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
-from database import SharedDatabase
-from config import DB_PATH
+from database import SharedDatabase, fetch_post_urls
+from config import DB_PATH, EVENT_EXTRACT_WORKERS
+import fast_json
 
 # Import ML libraries for clustering and summarization
 try:
+    from sklearn.base import clone
     from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
     from sklearn.cluster import DBSCAN
     MODELS_AVAILABLE = True
     print("✓ Using sklearn TfidfVectorizer for semantic similarity (lightweight, no PyTorch needed)")
@@ -27,9 +31,42 @@ except ImportError:
     MODELS_AVAILABLE = False
     print("Warning: ML libraries not available. Using fallback grouping.")
 
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 db = SharedDatabase(DB_PATH)
 
+# Countries are clustered concurrently; the post query, sparse products and
+# DBSCAN's distance search run largely outside the GIL
+EXTRACTION_POOL = ThreadPoolExecutor(max_workers=EVENT_EXTRACT_WORKERS, thread_name_prefix='events')
+
+INSERT_EVENT_SQL = '''
+    INSERT INTO events (country, title, description, post_ids, event_date, is_analyzed, post_count)
+    VALUES (?, ?, ?, ?, ?, 0, ?)
+'''
+
+# Summarization constants, built once instead of on every call
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+WORD_RE = re.compile(r'\b\w+\b')
+
+SUMMARY_STOPWORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'been', 'be',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those',
+    'hi', 'hello', 'my', 'me', 'i', 'you', 'we', 'they', 'he', 'she', 'it'
+})
+
+# Sentence scoring weights: earlier sentences get a position bonus, long ones a penalty
+POSITION_WEIGHT = 0.1
+LONG_SENTENCE_CHARS = 150
+LONG_SENTENCE_PENALTY = -0.2
+
+# Intro phrases skipped when picking a description sentence (AMA, Hi, etc.)
+GENERIC_STARTS = ('hi ', 'hello ', 'ama ', 'ask me anything')
+
 
 class EventExtractor:
     """Extracts thematic events from posts using clustering and extractive summarization"""
@@ -53,18 +90,20 @@ class EventExtractor:
                 self.vectorizer = None
                 self.summarizer = None
     
-    def extract_events_for_country(self, country: str) -> list:
+    def extract_events_for_country(self, country: str, seven_days_ago: str = None) -> list:
         """
         Group posts from a country into thematic events
         Returns list of events with title, description, and post IDs
+        seven_days_ago: ISO cutoff shared by all countries of one request
         """
         conn = db.get_connection()
         cursor = conn.cursor()
         
         # Get recent posts from last 7 days that haven't been grouped into events
-        seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
+        if seven_days_ago is None:
+            seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
         
-        print(f"DEBUG: Querying posts for {country} after {seven_days_ago}", flush=True)
+        logger.debug("Querying posts for %s after %s", country, seven_days_ago)
         
         # Get posts that aren't already in events
         # Include ALL post types (text, link, image, video, social) - they all have titles/text
@@ -86,7 +125,7 @@ class EventExtractor:
         posts = [{'id': row[0], 'text': row[1], 'timestamp': row[2], 'url': row[3], 'source': row[4], 'post_type': row[5]} 
                  for row in cursor.fetchall()]
         
-        print(f"DEBUG: Found {len(posts)} posts for {country}", flush=True)
+        logger.debug("Found %d posts for %s", len(posts), country)
         
         if len(posts) < 1:
             # Need at least 1 post to make an event
@@ -95,7 +134,7 @@ class EventExtractor:
         # Use ML clustering if available, otherwise simple keyword grouping
         if self.vectorizer:
             events = self._cluster_posts_ml(posts, country)
-            print(f"DEBUG: Extracted {len(events)} events for {country}", flush=True)
+            logger.debug("Extracted %d events for %s", len(events), country)
         else:
             events = self._cluster_posts_simple(posts, country)
         
@@ -104,13 +143,15 @@ class EventExtractor:
     def _cluster_posts_ml(self, posts: list, country: str) -> list:
         """Use TF-IDF vectorization and DBSCAN clustering to group similar posts"""
         
-        # Create TF-IDF vectors
+        # Create TF-IDF vectors. fit_transform stores the vocabulary on the
+        # vectorizer, so each call fits an unfitted copy to stay thread-safe.
         texts = [p['text'][:500] for p in posts]  # Limit to 500 chars
-        tfidf_matrix = self.vectorizer.fit_transform(texts)
+        tfidf_matrix = clone(self.vectorizer).fit_transform(texts)
         
         # Calculate cosine similarity matrix
-        # DBSCAN expects distance, so we use (1 - cosine_similarity)
-        similarity_matrix = cosine_similarity(tfidf_matrix)
+        # TF-IDF rows are already L2-normalized, so one sparse product gives the
+        # cosine similarities; DBSCAN expects distance, so we use (1 - similarity)
+        similarity_matrix = (tfidf_matrix @ tfidf_matrix.T).toarray()
         distance_matrix = np.clip(1 - similarity_matrix, 0, 2)  # Ensure non-negative distances
         
         # DBSCAN clustering (density-based, auto-detects number of clusters)
@@ -119,18 +160,16 @@ class EventExtractor:
         # Lenient threshold to ensure related topics cluster together
         clustering = DBSCAN(eps=0.75, min_samples=2, metric='precomputed').fit(distance_matrix)
         
-        # Group posts by cluster
-        clusters = defaultdict(list)
-        individual_posts = []  # Track unclustered posts
-        
-        for idx, label in enumerate(clustering.labels_):
-            if label != -1:  # -1 means noise (unclustered)
-                clusters[label].append(posts[idx])
-            else:
-                # Treat unclustered posts as individual events
-                individual_posts.append(posts[idx])
+        # Group posts by cluster (-1 means noise, i.e. unclustered)
+        labels = clustering.labels_
+        clusters = {
+            label: [posts[idx] for idx in np.flatnonzero(labels == label)]
+            for label in np.unique(labels[labels != -1])
+        }
+        # Treat unclustered posts as individual events
+        individual_posts = [posts[idx] for idx in np.flatnonzero(labels == -1)]
         
-        print(f"DEBUG: DBSCAN found {len(clusters)} clusters and {len(individual_posts)} individual posts", flush=True)
+        logger.debug("DBSCAN found %d clusters and %d individual posts", len(clusters), len(individual_posts))
         
         # Create events from clusters
         events = []
@@ -150,33 +189,32 @@ class EventExtractor:
     def _cluster_posts_simple(self, posts: list, country: str) -> list:
         """Simple keyword-based grouping as fallback"""
         
-        # Extract common keywords and group posts
-        from collections import Counter
-        
         # Simple approach: group posts by shared significant words
         clusters = defaultdict(list)
+        # Union of the significant words of each cluster's posts, kept up to
+        # date as posts join instead of being rebuilt for every comparison
+        cluster_word_sets = {}
         
         for post in posts:
             # Extract significant words (simple tokenization)
-            words = set([w.lower() for w in post['text'].split() if len(w) > 5])
+            words = {w.lower() for w in post['text'].split() if len(w) > 5}
             
             # Find existing cluster with shared words
             assigned = False
-            for cluster_id, cluster_posts in clusters.items():
-                cluster_words = set()
-                for cp in cluster_posts:
-                    cluster_words.update([w.lower() for w in cp['text'].split() if len(w) > 5])
-                
+            for cluster_id, cluster_words in cluster_word_sets.items():
                 # If >20% word overlap, add to cluster
                 if words and cluster_words:
                     overlap = len(words & cluster_words) / len(words | cluster_words)
                     if overlap > 0.2:
                         clusters[cluster_id].append(post)
+                        cluster_words |= words
                         assigned = True
                         break
             
             if not assigned:
-                clusters[len(clusters)].append(post)
+                cluster_id = len(clusters)
+                clusters[cluster_id].append(post)
+                cluster_word_sets[cluster_id] = words
         
         # Create events from clusters with at least 1 post
         events = []
@@ -213,7 +251,7 @@ class EventExtractor:
             'country': country,
             'title': title,
             'description': description,
-            'post_ids': json.dumps([p['id'] for p in posts]),
+            'post_ids': fast_json.dumps([p['id'] for p in posts]),
             'event_date': posts[0]['timestamp'],
             'post_count': len(posts),
             'urls': [p['url'] for p in posts if p['url']]
@@ -253,11 +291,11 @@ class EventExtractor:
                     first_sentence = summary.split('.')[0] + '.'
                     summary = first_sentence
                 
-                print(f"✓ Generated extractive summary: {summary[:80]}...")
+                logger.debug("✓ Generated extractive summary: %.80s...", summary)
                 return summary
                 
             except Exception as e:
-                print(f"⚠️  Summarization error: {e}")
+                logger.warning(f"⚠️  Summarization error: {e}")
                 return self._create_description_simple(posts)
         else:
             return self._create_description_simple(posts)
@@ -267,11 +305,8 @@ class EventExtractor:
         Lightweight extractive summarization using sentence scoring.
         Creates concise summaries by selecting the most informative sentences.
         """
-        import re
-        from collections import Counter
-        
         # Split into sentences
-        sentences = re.split(r'[.!?]+', text)
+        sentences = SENTENCE_SPLIT_RE.split(text)
         sentences = [s.strip() for s in sentences if len(s.strip()) > 20 and len(s.strip()) < 200]
         
         if not sentences:
@@ -281,39 +316,33 @@ class EventExtractor:
             return '. '.join(sentences) + '.'
         
         # Score sentences by word frequency and position
-        words = re.findall(r'\b\w+\b', text.lower())
+        words = WORD_RE.findall(text.lower())
         word_freq = Counter(words)
         
         # Remove common words
-        stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-                    'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'been', 'be',
-                    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-                    'should', 'may', 'might', 'must', 'can', 'this', 'that', 'these', 'those',
-                    'hi', 'hello', 'my', 'me', 'i', 'you', 'we', 'they', 'he', 'she', 'it'}
-        
-        for sw in stopwords:
+        for sw in SUMMARY_STOPWORDS:
             word_freq.pop(sw, None)
         
-        # Score each sentence
+        # Score each sentence (lookups bound to locals for the loop)
+        find_words = WORD_RE.findall
+        frequency = word_freq.get
+        sentence_count = len(sentences)
         sentence_scores = []
         for idx, sentence in enumerate(sentences):
-            words_in_sentence = re.findall(r'\b\w+\b', sentence.lower())
-            
             # Content score based on important words
-            content_score = sum(word_freq.get(word, 0) for word in words_in_sentence)
+            content_score = sum(frequency(word, 0) for word in find_words(sentence.lower()))
             
             # Position bonus: prefer earlier sentences (but not the very first if it's an intro)
-            position_score = (len(sentences) - idx) * 0.1 if idx > 0 else 0
+            position_score = (sentence_count - idx) * POSITION_WEIGHT if idx > 0 else 0
             
             # Penalty for very long sentences
-            length_penalty = -0.2 if len(sentence) > 150 else 0
+            length_penalty = LONG_SENTENCE_PENALTY if len(sentence) > LONG_SENTENCE_CHARS else 0
             
             total_score = content_score + position_score + length_penalty
             sentence_scores.append((total_score, sentence, idx))
         
-        # Sort by score and take top N
-        sentence_scores.sort(reverse=True, key=lambda x: x[0])
-        top_sentences = sentence_scores[:max_sentences]
+        # Take the top N by score without sorting every sentence
+        top_sentences = heapq.nlargest(max_sentences, sentence_scores, key=lambda x: x[0])
         
         # Sort by original position to maintain reading flow
         top_sentences.sort(key=lambda x: x[2])
@@ -340,20 +369,17 @@ class EventExtractor:
             return "Multiple posts about this topic."
         
         # Split into sentences
-        import re
-        sentences = re.split(r'[.!?]+', text)
+        sentences = SENTENCE_SPLIT_RE.split(text)
         sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
         
         if not sentences:
             return text[:150] + "..." if len(text) > 150 else text
         
-        # Skip generic intro sentences (AMA, Hi, etc.)
-        generic_starts = ['hi ', 'hello ', 'ama ', 'ask me anything']
+        # Skip generic intro sentences
         meaningful_sentence = None
         
         for sentence in sentences[:3]:  # Check first 3 sentences
-            sentence_lower = sentence.lower()
-            if not any(sentence_lower.startswith(g) for g in generic_starts):
+            if not sentence.lower().startswith(GENERIC_STARTS):
                 if len(sentence) > 30 and len(sentence) < 200:
                     meaningful_sentence = sentence
                     break
@@ -392,7 +418,7 @@ class EventExtractor:
             'country': country,
             'title': title,
             'description': description,
-            'post_ids': json.dumps([p['id'] for p in posts]),
+            'post_ids': fast_json.dumps([p['id'] for p in posts]),
             'event_date': posts[0]['timestamp'],
             'post_count': len(posts),
             'urls': [p['url'] for p in posts if p['url']]
@@ -433,32 +459,50 @@ def extract_events():
     
     total_events = 0
     results = {}
+    # One cutoff for the whole request instead of one clock read per country
+    seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
+    rows_by_country = {}
     
-    for country in countries:
+    futures = {
+        country: EXTRACTION_POOL.submit(extractor.extract_events_for_country, country, seven_days_ago)
+        for country in countries
+    }
+    for country, future in futures.items():
         try:
-            events = extractor.extract_events_for_country(country)
-            
-            if events:
-                # Save events to database with batch insert
-                conn = db.get_connection()
-                cursor = conn.cursor()
-                
-                # Batch insert for better performance
-                cursor.executemany('''
-                    INSERT INTO events (country, title, description, post_ids, event_date, is_analyzed, post_count)
-                    VALUES (?, ?, ?, ?, ?, 0, ?)
-                ''', [(event['country'], event['title'], event['description'], 
-                       event['post_ids'], event['event_date'], event['post_count']) for event in events])
-                
-                conn.commit()
-            
+            events = future.result()
+            rows_by_country[country] = [
+                (event['country'], event['title'], event['description'],
+                 event['post_ids'], event['event_date'], event['post_count'])
+                for event in events
+            ]
             results[country] = len(events)
             total_events += len(events)
             
         except Exception as e:
-            print(f"Error extracting events for {country}: {e}")
+            logger.error(f"Error extracting events for {country}: {e}")
             results[country] = 0
     
+    # Save all countries' events in one transaction (one commit instead of one per
+    # country); the write lock is only taken once clustering has finished
+    all_rows = [row for rows in rows_by_country.values() for row in rows]
+    if all_rows:
+        try:
+            with db.transaction() as conn:
+                conn.executemany(INSERT_EVENT_SQL, all_rows)
+        except Exception as e:
+            # Keep the countries that can be saved; only report events that were stored
+            logger.error(f"Error storing events in one batch, retrying per country: {e}")
+            for country, rows in rows_by_country.items():
+                if not rows:
+                    continue
+                try:
+                    with db.transaction() as conn:
+                        conn.executemany(INSERT_EVENT_SQL, rows)
+                except Exception as e:
+                    logger.error(f"Error storing events for {country}: {e}")
+                    total_events -= results[country]
+                    results[country] = 0
+    
     return jsonify({
         'status': 'success',
         'total_events': total_events,
@@ -481,16 +525,13 @@ def get_country_events(country):
         LIMIT 20
     ''', (country,))
     
+    rows = [(row, fast_json.loads(row[3])) for row in cursor.fetchall()]
+    # Post URLs for all events in one query instead of one per event
+    url_by_post = fetch_post_urls(cursor, [post_id for _, post_ids in rows for post_id in post_ids])
+    
     events = []
-    for row in cursor.fetchall():
-        post_ids = json.loads(row[3])
-        
-        # Get post URLs
-        cursor.execute(f'''
-            SELECT url FROM raw_posts 
-            WHERE id IN ({','.join(['?']*len(post_ids))})
-        ''', post_ids)
-        urls = [r[0] for r in cursor.fetchall() if r[0]]
+    for row, post_ids in rows:
+        urls = [url_by_post[post_id] for post_id in post_ids if url_by_post.get(post_id)]
         
         events.append({
             'id': row[0],
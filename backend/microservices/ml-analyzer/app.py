@@ -4,18 +4,30 @@ Emotion analysis for text posts
 No collective filtering needed - all posts from news subreddits
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import logging
 import os
 import sys
 import json
+import time
+import bisect
+import contextlib
+import hashlib
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
 
 # Add shared module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
 from database import SharedDatabase
-from config import DB_PATH
+from config import (
+    DB_PATH, EMOTION_BATCH_SIZE, EMOTION_MAX_BATCH_SIZE, EMOTION_BATCH_TARGET_SECONDS,
+    EMOTION_CACHE_SIZE, EMOTION_HALF_PRECISION, EMOTION_ONNX, EMOTION_ONNX_DIR,
+    EMOTION_TORCH_COMPILE, EMOTION_INT8
+)
 from metrics import get_metrics, track_request_metrics, track_processing_time
 
 # Initialize Sentry for error tracking
@@ -46,6 +58,28 @@ except Exception:
     # Provide a placeholder so tests can patch `pipeline` without import errors
     pipeline = None
 
+# Optional ONNX Runtime backend for CPU inference (enabled with EMOTION_ONNX)
+try:
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+except Exception:
+    ORTModelForSequenceClassification = None
+
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+
+def inference_mode():
+    """
+    torch.inference_mode() when PyTorch is available: no autograd graph,
+    version counters or view tracking for the forward pass. No-op otherwise.
+    """
+    return torch.inference_mode() if torch is not None else contextlib.nullcontext()
+
+# A batch never mixes texts more than this many times longer than its shortest,
+# so short texts are not padded out to the length of long ones
+LENGTH_BUCKET_RATIO = 2
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -60,13 +94,27 @@ db = SharedDatabase(DB_PATH)
 class EmotionAnalyzer:
     """Emotion analysis using RoBERTa + VADER fallback"""
 
-    def __init__(self):
-        logger.info("🔥 Loading emotion analysis model...")
-        
+    def __init__(self, preload=True):
         self.vader = SentimentIntensityAnalyzer()
         
-        # Emotion Analysis (RoBERTa)
-        logger.info("  Loading emotion model...")
+        # Texts per forward pass, tuned by measured latency (see _adapt_batch_size)
+        self.batch_size = max(1, min(EMOTION_BATCH_SIZE, EMOTION_MAX_BATCH_SIZE))
+        
+        # LRU cache of model results keyed by a digest of the model input
+        self.result_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        
+        # Set once load_model has finished, whether or not the model loaded
+        self.emotion_classifier = None
+        self.emotion_available = False
+        self.model_ready = threading.Event()
+        
+        if preload:
+            self.load_model()
+
+    def load_model(self):
+        """Load the emotion model (RoBERTa), falling back to VADER if it fails"""
+        logger.info("🔥 Loading emotion analysis model...")
         try:
             # Ensure pipeline exists and create with CPU if torch unavailable
             device = -1
@@ -79,13 +127,29 @@ class EmotionAnalyzer:
             if pipeline is None:
                 raise RuntimeError("Transformers pipeline not available")
 
-            self.emotion_classifier = pipeline(
-                "text-classification",
-                model="j-hartmann/emotion-english-distilroberta-base",
-                device=device
-            )
+            # Half precision halves weight memory and uses tensor cores on GPU;
+            # CPUs stay in fp32, where fp16 matmuls are slow or unsupported
+            dtype_kwargs = {}
+            if device == 0 and EMOTION_HALF_PRECISION:
+                dtype_kwargs['torch_dtype'] = torch.float16
+
+            classifier = None
+            if device == -1 and EMOTION_ONNX:
+                classifier = self._load_onnx_classifier()
+            if classifier is None:
+                classifier = pipeline(
+                    "text-classification",
+                    model=EMOTION_MODEL,
+                    device=device,
+                    **dtype_kwargs
+                )
+                if device == -1 and EMOTION_INT8:
+                    self._quantize_model(classifier)
+                if EMOTION_TORCH_COMPILE:
+                    self._compile_model(classifier)
+            self.emotion_classifier = classifier
             self.emotion_available = True
-            logger.info("  ✓ Emotion model loaded (~500MB)")
+            logger.info(f"  ✓ Emotion model loaded (~500MB{', fp16' if dtype_kwargs else ''})")
         except (OSError, ValueError, RuntimeError) as e:
             logger.warning(f"  ⚠️ Emotion model failed to load: {e}")
             self.emotion_classifier = None
@@ -101,30 +165,132 @@ class EmotionAnalyzer:
         else:
             logger.warning("⚠️ Emotion model unavailable - using VADER fallback only")
         logger.info("ℹ️  No collective filtering - all posts from news subreddits are collective by nature")
+        self.model_ready.set()
+
+    def _load_onnx_classifier(self):
+        """
+        Build the emotion pipeline on ONNX Runtime with all graph optimizations.
+        The model is exported on first use and loaded from EMOTION_ONNX_DIR afterwards.
+        Returns None (PyTorch is used instead) if the backend is unavailable.
+        """
+        if ORTModelForSequenceClassification is None:
+            logger.warning("  ⚠️ EMOTION_ONNX is set but optimum[onnxruntime] is not installed")
+            return None
+        try:
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = os.cpu_count() or 1
+
+            exported = os.path.isdir(EMOTION_ONNX_DIR)
+            source = EMOTION_ONNX_DIR if exported else EMOTION_MODEL
+            model = ORTModelForSequenceClassification.from_pretrained(
+                source, export=not exported, session_options=options
+            )
+            tokenizer = AutoTokenizer.from_pretrained(source)
+            if not exported:
+                model.save_pretrained(EMOTION_ONNX_DIR)
+                tokenizer.save_pretrained(EMOTION_ONNX_DIR)
+                logger.info(f"  ✓ Exported emotion model to ONNX: {EMOTION_ONNX_DIR}")
+
+            logger.info("  ✓ Using ONNX Runtime for emotion inference")
+            return pipeline("text-classification", model=model, tokenizer=tokenizer)
+        except Exception as e:
+            logger.warning(f"  ⚠️ ONNX emotion model failed to load, using PyTorch: {e}")
+            return None
+
+    def _quantize_model(self, classifier):
+        """
+        Swap the pipeline model's Linear layers for int8 dynamically quantized
+        ones; they dominate the FLOPs and then run as int8 (VNNI) GEMMs on CPU.
+        Left in fp32 on failure.
+        """
+        try:
+            classifier.model = torch.ao.quantization.quantize_dynamic(
+                classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            logger.info("  ✓ Emotion model quantized to int8")
+        except Exception as e:
+            logger.warning(f"  ⚠️ int8 quantization failed, using the fp32 model: {e}")
+
+    def _compile_model(self, classifier):
+        """
+        Replace the pipeline's model with its torch.compile'd version, which fuses
+        kernels and removes per-layer Python dispatch. dynamic=True because batch
+        size and padded length vary between calls. Left uncompiled on failure.
+        """
+        if not hasattr(torch, 'compile'):
+            logger.warning("  ⚠️ EMOTION_TORCH_COMPILE is set but this PyTorch has no torch.compile")
+            return
+        try:
+            classifier.model = torch.compile(classifier.model, dynamic=True)
+            logger.info("  ✓ Emotion model compiled with torch.compile")
+        except Exception as e:
+            logger.warning(f"  ⚠️ torch.compile failed, using the eager model: {e}")
+
+    def _uses_model(self, text):
+        """Whether text is analyzed by the model rather than VADER"""
+        return self.emotion_available and text and len(text) > 10
+
+    def _emotion_from_results(self, results):
+        """Build an emotion result from the model output for one text, or None"""
+        if not results:
+            return None
+        # A single input returns [{'label': 'joy', 'score': 0.99}, ...];
+        # each entry of a batched call is one such dict (or list of dicts)
+        if isinstance(results, dict):
+            results = [results]
+
+        emotions_dict = {}
+        for item in results:
+            if isinstance(item, dict) and 'label' in item and 'score' in item:
+                emotions_dict[item['label']] = round(item['score'], 3)
+
+        if not emotions_dict:
+            return None
+
+        # Get top emotion
+        top_emotion = max(emotions_dict.items(), key=lambda x: x[1])[0]
+        confidence = emotions_dict[top_emotion]
+
+        return {
+            'top_emotion': top_emotion,
+            'confidence': round(confidence, 2),
+            'all_emotions': emotions_dict
+        }
+
+    def _cache_key(self, model_input):
+        """Fixed-size digest of the exact text the model sees"""
+        return hashlib.blake2b(model_input.encode('utf-8'), digest_size=16).digest()
+
+    def _cache_get(self, key):
+        with self.cache_lock:
+            result = self.result_cache.get(key)
+            if result is not None:
+                self.result_cache.move_to_end(key)
+            return result
+
+    def _cache_put(self, key, result):
+        with self.cache_lock:
+            self.result_cache[key] = result
+            self.result_cache.move_to_end(key)
+            if len(self.result_cache) > EMOTION_CACHE_SIZE:
+                self.result_cache.popitem(last=False)
 
     def analyze_emotion(self, text):
         """Analyze text emotion using RoBERTa or fallback methods"""
         try:
-            if self.emotion_available and text and len(text) > 10:
-                results = self.emotion_classifier(text[:512])
-
-                if results and len(results) > 0:
-                    emotions_dict = {}
-                    # Pipeline returns a list of dicts like [{'label': 'joy', 'score': 0.99}, ...]
-                    for item in results:
-                        if isinstance(item, dict) and 'label' in item and 'score' in item:
-                            emotions_dict[item['label']] = round(item['score'], 3)
-
-                    if emotions_dict:
-                        # Get top emotion
-                        top_emotion = max(emotions_dict.items(), key=lambda x: x[1])[0]
-                        confidence = emotions_dict[top_emotion]
-
-                        return {
-                            'top_emotion': top_emotion,
-                            'confidence': round(confidence, 2),
-                            'all_emotions': emotions_dict
-                        }
+            if self._uses_model(text):
+                model_input = text[:512]
+                key = self._cache_key(model_input)
+                result = self._cache_get(key)
+                if result is None:
+                    with inference_mode():
+                        output = self.emotion_classifier(model_input)
+                    result = self._emotion_from_results(output)
+                    if result:
+                        self._cache_put(key, result)
+                if result:
+                    return result
         except (ValueError, KeyError) as e:
             logger.error(f"Data format error in emotion analysis: {e}")
         except RuntimeError as e:
@@ -132,7 +298,79 @@ class EmotionAnalyzer:
         except Exception as e:
             logger.exception(f"Unexpected emotion analysis error: {e}")
         
-        # Fallback to VADER
+        return self._vader_emotion(text)
+
+    def analyze_emotion_batch(self, texts):
+        """Analyze many texts, running the model over them in batches"""
+        results = [None] * len(texts)
+        # Indices of the texts missing from the cache, grouped by cache key so
+        # duplicate texts in one batch run through the model only once
+        pending = {}
+        for i, text in enumerate(texts):
+            if self._uses_model(text):
+                key = self._cache_key(text[:512])
+                results[i] = self._cache_get(key)
+                if results[i] is None:
+                    pending.setdefault(key, []).append(i)
+
+        # Sorting the unique texts by length keeps similar lengths in the same
+        # batch, so little padding is wasted; results are stored by index,
+        # which restores the input order.
+        groups = sorted(pending.items(), key=lambda item: len(texts[item[1][0]][:512]))
+        if groups:
+            try:
+                outputs = self._classify_in_batches([texts[indices[0]][:512] for _, indices in groups])
+                for (key, indices), output in zip(groups, outputs):
+                    result = self._emotion_from_results(output)
+                    for i in indices:
+                        results[i] = result
+                    if result:
+                        self._cache_put(key, result)
+            except Exception as e:
+                # Analyze one by one so a single bad input cannot fail the batch
+                logger.error(f"Batched emotion analysis failed, analyzing individually: {e}")
+                return [self.analyze_emotion(text) for text in texts]
+
+        return [result or self._vader_emotion(text) for result, text in zip(results, texts)]
+
+    def _classify_in_batches(self, texts):
+        """
+        Run the model over length-sorted texts in chunks of the current adaptive
+        batch size, also cutting a chunk where lengths exceed its length bucket
+        """
+        lengths = [len(text) for text in texts]
+        outputs = []
+        start = 0
+        while start < len(texts):
+            end = min(start + self.batch_size, len(texts))
+            bucket_end = bisect.bisect_right(lengths, max(1, lengths[start]) * LENGTH_BUCKET_RATIO, start, end)
+            chunk = texts[start:max(bucket_end, start + 1)]
+            started = time.perf_counter()
+            try:
+                with inference_mode():
+                    outputs.extend(self.emotion_classifier(chunk, batch_size=len(chunk)))
+            except RuntimeError:
+                # Typically out of memory: halve the batch and retry the rest
+                if len(chunk) == 1:
+                    raise
+                self.batch_size = max(1, len(chunk) // 2)
+                logger.warning(f"Emotion batch of {len(chunk)} failed, retrying with {self.batch_size}")
+                continue
+            self._adapt_batch_size(len(chunk), time.perf_counter() - started)
+            start += len(chunk)
+        return outputs
+
+    def _adapt_batch_size(self, size, elapsed):
+        """AIMD: grow by one while batches beat the target latency, halve when too slow"""
+        if size < self.batch_size:
+            return  # A short final chunk says nothing about the full size
+        if elapsed < 0.9 * EMOTION_BATCH_TARGET_SECONDS:
+            self.batch_size = min(self.batch_size + 1, EMOTION_MAX_BATCH_SIZE)
+        elif elapsed > 1.2 * EMOTION_BATCH_TARGET_SECONDS:
+            self.batch_size = max(1, self.batch_size // 2)
+
+    def _vader_emotion(self, text):
+        """Fallback: map VADER sentiment to an emotion"""
         try:
             vader_scores = self.vader.polarity_scores(text)
             
@@ -156,9 +394,72 @@ class EmotionAnalyzer:
             'is_collective': True  # All posts from news subreddits are collective
         }
 
+    def analyze_batch(self, texts):
+        """Batched analyze_full: one result per text, in order"""
+        return [
+            {'emotion': emotion_result, 'is_collective': True}
+            for emotion_result in self.analyze_emotion_batch(texts)
+        ]
+
+
+# Initialize analyzer. The model loads in the background so the service starts
+# answering (and upstream services keep fetching and extracting) meanwhile;
+# analysis endpoints return 503 until it is ready rather than fall back to VADER.
+analyzer = EmotionAnalyzer(preload=False)
+threading.Thread(target=analyzer.load_model, name='load-emotion-model', daemon=True).start()
+
+MODEL_LOADING_RESPONSE = {'error': 'Emotion model is still loading', 'retry': True}
+
+# Events analyzed per chunk; each chunk is written while the next one is analyzed
+ANALYSIS_CHUNK_SIZE = 32
+
+UPDATE_EVENT_EMOTION_SQL = '''
+    UPDATE events
+    SET emotion = ?, confidence = ?, is_analyzed = 1
+    WHERE id = ?
+'''
+
+
+def write_analyses(updates_queue, written: list):
+    """
+    Consumer: commit each queued list of (emotion, confidence, event_id) as one
+    transaction until a None sentinel arrives. Appends row counts to written.
+    Any error only drops its own chunk: the loop keeps draining so the producer
+    never blocks on a full queue.
+    """
+    conn = None
+    while True:
+        updates = updates_queue.get()
+        if updates is None:
+            break
+        try:
+            if conn is None:
+                conn = db.get_connection()
+            conn.executemany(UPDATE_EVENT_EMOTION_SQL, updates)
+            conn.commit()
+            written.append(len(updates))
+        except Exception as e:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+            logger.error(f"Error storing {len(updates)} event analyses: {e}")
 
-# Initialize analyzer
-analyzer = EmotionAnalyzer()
+
+def analysis_updates(events, analyses) -> list:
+    """Build (emotion, confidence, event_id) rows, skipping malformed results"""
+    updates = []
+    for (event_id, *_), analysis in zip(events, analyses):
+        try:
+            updates.append((
+                analysis['emotion']['top_emotion'],
+                analysis['emotion']['confidence'],
+                event_id
+            ))
+        except (KeyError, TypeError) as e:
+            logger.error(f"Error analyzing event {event_id}: {e}")
+    return updates
 
 
 @app.route('/health', methods=['GET'])
@@ -168,6 +469,7 @@ def health():
         'status': 'healthy',
         'service': 'ml-analyzer',
         'emotion_available': analyzer.emotion_available,
+        'model_loaded': analyzer.model_ready.is_set(),
         'note': 'All posts are collective (news subreddits only)'
     })
 
@@ -175,7 +477,6 @@ def health():
 @app.route('/metrics', methods=['GET'])
 def metrics():
     """Prometheus metrics endpoint"""
-    from flask import Response
     metrics_data, content_type = get_metrics()
     return Response(metrics_data, mimetype=content_type)
 
@@ -189,16 +490,40 @@ def analyze():
     
     if not text:
         return jsonify({'error': 'No text provided'}), 400
+    if not analyzer.model_ready.is_set():
+        return jsonify(MODEL_LOADING_RESPONSE), 503
     
     result = analyzer.analyze_full(text)
     return jsonify(result)
 
 
+@app.route('/analyze/batch', methods=['POST'])
+@track_request_metrics
+def analyze_batch():
+    """Analyze many posts with batched model calls, results in input order"""
+    data = request.json or {}
+    texts = data.get('texts')
+    
+    if not isinstance(texts, list) or not texts:
+        return jsonify({'error': 'No texts provided'}), 400
+    if not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'texts must be a list of strings'}), 400
+    if not analyzer.model_ready.is_set():
+        return jsonify(MODEL_LOADING_RESPONSE), 503
+    
+    return jsonify({'results': analyzer.analyze_batch(texts)})
+
+
 @app.route('/process/pending', methods=['POST'])
 def process_pending():
     """Process all pending events (emotion analysis)"""
     batch_size = request.json.get('batch_size', 100) if request.json else 100
     
+    # Leave events pending until the model is loaded; analyzing them with the
+    # VADER fallback would store the weaker emotions permanently
+    if not analyzer.model_ready.is_set():
+        return jsonify(MODEL_LOADING_RESPONSE), 503
+    
     try:
         conn = db.get_connection()
         cursor = conn.cursor()
@@ -216,33 +541,27 @@ def process_pending():
         if not events:
             return jsonify({'message': 'No pending events', 'processed': 0})
         
-        processed = 0
-        for event_id, title, description, country, event_date, post_ids in events:
-            try:
-                # Analyze event description for emotion
+        # Writer thread stores finished chunks while the model works on the next
+        updates_queue = queue.Queue(maxsize=4)
+        written = []
+        writer = threading.Thread(target=write_analyses, args=(updates_queue, written), daemon=True)
+        writer.start()
+        
+        try:
+            for start in range(0, len(events), ANALYSIS_CHUNK_SIZE):
+                chunk = events[start:start + ANALYSIS_CHUNK_SIZE]
+                # Analyze event descriptions for emotion in batched model calls
                 # Description now contains T5-generated summary from event-extractor
                 # This summary intelligently combines title + body + blog content
-                combined_text = f"{title}. {description}"
-                analysis = analyzer.analyze_full(combined_text)
-                
-                # Update event with emotion data
-                cursor.execute('''
-                    UPDATE events
-                    SET emotion = ?, confidence = ?, is_analyzed = 1
-                    WHERE id = ?
-                ''', (
-                    analysis['emotion']['top_emotion'],
-                    analysis['emotion']['confidence'],
-                    event_id
-                ))
-                
-                processed += 1
-                
-            except Exception as e:
-                logger.error(f"Error analyzing event {event_id}: {e}")
-                continue
+                texts = [f"{title}. {description}" for _, title, description, _, _, _ in chunk]
+                updates = analysis_updates(chunk, analyzer.analyze_batch(texts))
+                if updates:
+                    updates_queue.put(updates)
+        finally:
+            updates_queue.put(None)
+            writer.join()
         
-        conn.commit()
+        processed = sum(written)
         logger.info(f"✅ Processed {processed}/{len(events)} events")
         
         return jsonify({
@@ -263,8 +582,10 @@ def stats():
         conn = db.get_connection()
         cursor = conn.cursor()
         
-        total_events = cursor.execute("SELECT COUNT(*) FROM events").fetchone()[0]
-        analyzed_events = cursor.execute("SELECT COUNT(*) FROM events WHERE is_analyzed = 1").fetchone()[0]
+        # Both counts in one pass over the events table
+        total_events, analyzed_events = cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(is_analyzed = 1), 0) FROM events"
+        ).fetchone()
         pending = total_events - analyzed_events
         
         return jsonify({
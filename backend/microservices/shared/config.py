@@ -30,6 +30,32 @@ REDDIT_FETCH_LIMIT = int(os.getenv('REDDIT_FETCH_LIMIT', '200'))  # Increased fo
 # Data fetch concurrency
 DATA_FETCH_WORKERS = int(os.getenv('DATA_FETCH_WORKERS', '10'))  # More workers for parallel processing
 
+# Content extraction
+EXTRACTION_CONNECT_TIMEOUT = float(os.getenv('EXTRACTION_CONNECT_TIMEOUT', '5'))
+EXTRACTION_READ_TIMEOUT = float(os.getenv('EXTRACTION_READ_TIMEOUT', '10'))
+MAX_PAGE_BYTES = int(os.getenv('MAX_PAGE_BYTES', str(2 * 1024 * 1024)))  # Larger pages are skipped
+FAILED_DOMAIN_MAX_FAILURES = int(os.getenv('FAILED_DOMAIN_MAX_FAILURES', '3'))  # Failures before a domain is skipped
+FAILED_DOMAIN_TTL_SECONDS = int(os.getenv('FAILED_DOMAIN_TTL_SECONDS', '3600'))
+CONTENT_EXTRACT_WORKERS = int(os.getenv('CONTENT_EXTRACT_WORKERS', '8'))  # Concurrent article fetches per batch
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', '2000'))  # Translated texts kept in the LRU cache
+
+# Event extraction
+EVENT_EXTRACT_WORKERS = int(os.getenv('EVENT_EXTRACT_WORKERS', '4'))  # Countries clustered concurrently
+
+# Emotion analysis
+EMOTION_BATCH_SIZE = int(os.getenv('EMOTION_BATCH_SIZE', '16'))  # Initial texts per model forward pass
+EMOTION_MAX_BATCH_SIZE = int(os.getenv('EMOTION_MAX_BATCH_SIZE', '64'))
+EMOTION_BATCH_TARGET_SECONDS = float(os.getenv('EMOTION_BATCH_TARGET_SECONDS', '2.0'))  # Batch size adapts to this latency
+EMOTION_CACHE_SIZE = int(os.getenv('EMOTION_CACHE_SIZE', '1000'))  # Model results kept in the LRU cache
+EMOTION_HALF_PRECISION = os.getenv('EMOTION_HALF_PRECISION', 'true').lower() == 'true'  # fp16 weights on CUDA
+# ONNX Runtime for CPU inference (needs: pip install optimum[onnxruntime]); exported once into EMOTION_ONNX_DIR
+EMOTION_ONNX = os.getenv('EMOTION_ONNX', 'false').lower() == 'true'
+# int8 dynamic quantization of the model's Linear layers for CPU inference
+EMOTION_INT8 = os.getenv('EMOTION_INT8', 'false').lower() == 'true'
+# torch.compile the PyTorch model (PyTorch 2.x); the first batches of each shape pay the compile time
+EMOTION_TORCH_COMPILE = os.getenv('EMOTION_TORCH_COMPILE', 'false').lower() == 'true'
+EMOTION_ONNX_DIR = os.getenv('EMOTION_ONNX_DIR', os.path.join(os.path.dirname(__file__), 'models_onnx', 'emotion'))
+
 # Regional mapping
 REGIONS = {
     "europe": [
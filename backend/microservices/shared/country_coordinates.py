@@ -190,6 +190,14 @@ COUNTRY_COORDINATES = {
 }
 
 
+# Case-insensitive index; country names are stored lowercase in the database,
+# so most lookups miss the exact-case keys above. setdefault keeps the first
+# entry when two keys differ only in case, as the old linear scan did.
+_COORDINATES_BY_LOWER = {}
+for _name, _coords in COUNTRY_COORDINATES.items():
+    _COORDINATES_BY_LOWER.setdefault(_name.lower(), _coords)
+
+
 def get_coordinates(country):
     """
     Get coordinates for a country name
@@ -204,14 +212,8 @@ def get_coordinates(country):
     if country in COUNTRY_COORDINATES:
         return COUNTRY_COORDINATES[country]
     
-    # Try case-insensitive match
-    country_lower = country.lower()
-    for key, coords in COUNTRY_COORDINATES.items():
-        if key.lower() == country_lower:
-            return coords
-    
-    # Default to [0, 0] if not found
-    return [0, 0]
+    # Try case-insensitive match, defaulting to [0, 0] if not found
+    return _COORDINATES_BY_LOWER.get(country.lower(), [0, 0])
 
 
 def get_all_countries():
@@ -7,16 +7,111 @@ import json
 from datetime import datetime, timedelta
 from typing import List, Dict
 import threading
+import queue
+import weakref
 from collections import defaultdict
 import logging
 import os
+from contextlib import contextmanager
+
+import fast_json
+
+
+# Compiled statements kept per connection. sqlite3 already caches prepared
+# statements by SQL text; the default of 128 entries is raised so the services'
+# many distinct statements don't evict each other on long-lived connections.
+STATEMENT_CACHE_SIZE = 256
+
+# Page cache per connection in KiB (negative PRAGMA cache_size). Pages are
+# allocated on demand, so this is an upper bound; each service pools several
+# connections, which keeps it below the 64 MiB often suggested for one connection.
+CACHE_SIZE_KIB = 16384
+
+# Reads go through a memory map of the first 256 MiB of the database file
+# instead of a read() syscall and copy per page. The mapping is shared by all
+# connections through the OS page cache, so unlike cache_size it is not
+# multiplied by the pool size.
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+
+INSERT_RAW_POST_SQL = '''INSERT OR IGNORE INTO raw_posts
+    (id, text, country, timestamp, source, url, author, score, post_type, media_url, link_url, needs_extraction)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)'''
+
+# needs_extraction value marking posts claimed by a content-extractor batch
+EXTRACTION_IN_PROGRESS = 2
+
+# Release posts claimed by a content-extractor run that stopped mid-batch
+RELEASE_EXTRACTION_CLAIMS_SQL = f'''
+    UPDATE raw_posts
+    SET needs_extraction = CASE WHEN link_url IS NULL THEN 0 ELSE 1 END
+    WHERE needs_extraction = {EXTRACTION_IN_PROGRESS}
+'''
+
+
+# Per (country, emotion) counts of analyzed events, kept current by the
+# triggers below so dashboards never scan the events table
+EVENT_STATS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS event_stats_insert AFTER INSERT ON events
+    WHEN NEW.is_analyzed = 1
+    BEGIN
+        INSERT INTO event_stats (country, emotion, event_count)
+        VALUES (NEW.country, COALESCE(NEW.emotion, ''), 1)
+        ON CONFLICT(country, emotion) DO UPDATE SET event_count = event_count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS event_stats_delete AFTER DELETE ON events
+    WHEN OLD.is_analyzed = 1
+    BEGIN
+        UPDATE event_stats SET event_count = event_count - 1
+        WHERE country = OLD.country AND emotion = COALESCE(OLD.emotion, '');
+        DELETE FROM event_stats WHERE event_count <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS event_stats_update AFTER UPDATE OF country, emotion, is_analyzed ON events
+    WHEN OLD.is_analyzed = 1 OR NEW.is_analyzed = 1
+    BEGIN
+        UPDATE event_stats SET event_count = event_count - 1
+        WHERE OLD.is_analyzed = 1 AND country = OLD.country AND emotion = COALESCE(OLD.emotion, '');
+        INSERT INTO event_stats (country, emotion, event_count)
+        SELECT NEW.country, COALESCE(NEW.emotion, ''), 1 WHERE NEW.is_analyzed = 1
+        ON CONFLICT(country, emotion) DO UPDATE SET event_count = event_count + 1;
+        DELETE FROM event_stats WHERE event_count <= 0;
+    END
+    '''
+]
+
+
+def fetch_post_urls(cursor, post_ids) -> Dict[str, str]:
+    """Map post id -> url for many posts with one IN query; posts without a url are left out"""
+    ids = list(dict.fromkeys(post_ids))
+    if not ids:
+        return {}
+    placeholders = ','.join('?' * len(ids))
+    cursor.execute(f'SELECT id, url FROM raw_posts WHERE id IN ({placeholders}) AND url IS NOT NULL', ids)
+    return dict(cursor.fetchall())
+
+
+class _ConnectionLease:
+    """Holds a pooled connection for the lifetime of one thread"""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
 
 
 class SharedDatabase:
     """Thread-safe database connection manager"""
 
-    def __init__(self, db_path='posts.db'):
+    def __init__(self, db_path='posts.db', pool_size=10):
         self.db_path = db_path
+        self._local = threading.local()
+        # Idle connections left behind by finished threads (Flask serves each
+        # request on a new thread, so without this every request reconnects)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
         logger = logging.getLogger(__name__)
         logger.info(f"Initializing SharedDatabase with path: {self.db_path}")
 
@@ -39,21 +134,52 @@ class SharedDatabase:
             self.init_database()
     
     def get_connection(self):
-        """Get thread-local database connection for thread safety"""
-        if not hasattr(self, '_local'):
-            self._local = threading.local()
-        
-        if not hasattr(self._local, 'conn') or self._local.conn is None:
-            try:
-                self._local.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            except sqlite3.OperationalError:
-                # Fall back to in-memory database if the file DB cannot be opened
-                self._local.conn = sqlite3.connect(':memory:', check_same_thread=False)
-            # Enable Write-Ahead Logging for concurrent reads/writes
-            self._local.conn.execute('PRAGMA journal_mode=WAL')
-            self._local.conn.execute('PRAGMA synchronous=NORMAL')
-        
-        return self._local.conn
+        """Get thread-local database connection for thread safety.
+
+        The connection is checked out of the pool on first use in a thread and
+        handed back to the pool when that thread exits.
+        """
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            lease = _ConnectionLease(self._checkout())
+            release = weakref.finalize(lease, self._release, lease.conn)
+            release.atexit = False
+            self._local.lease = lease
+        return lease.conn
+
+    def _connect(self):
+        """Open a new configured connection"""
+        try:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        except sqlite3.OperationalError:
+            # Fall back to in-memory database if the file DB cannot be opened
+            conn = sqlite3.connect(':memory:', check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        # Enable Write-Ahead Logging for concurrent reads/writes
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # Sorts, GROUP BY and temp indexes in memory instead of temp files
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE_BYTES}')
+        return conn
+
+    def _checkout(self):
+        """Reuse an idle pooled connection or open a new one"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        """Return a connection to the pool once its thread is gone"""
+        try:
+            # Discard anything the finished thread left uncommitted
+            conn.rollback()
+            self._pool.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
 
     def init_database(self):
         """Initialize database schema"""
@@ -119,8 +245,53 @@ class SharedDatabase:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_country_analyzed ON events(country, is_analyzed)')
 
         conn.commit()
+        self._init_event_stats(conn)
+
+    def _init_event_stats(self, conn):
+        """Create the trigger-maintained event_stats table, backfilling it once"""
+        # IMMEDIATE so services starting together cannot both run the backfill
+        with self.transaction():
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_stats'"
+            ).fetchone()
+            if not exists:
+                conn.execute('''
+                    CREATE TABLE event_stats (
+                        country TEXT NOT NULL,
+                        emotion TEXT NOT NULL,
+                        event_count INTEGER NOT NULL,
+                        PRIMARY KEY (country, emotion)
+                    )
+                ''')
+                conn.execute('''
+                    INSERT INTO event_stats (country, emotion, event_count)
+                    SELECT country, COALESCE(emotion, ''), COUNT(*)
+                    FROM events WHERE is_analyzed = 1
+                    GROUP BY country, COALESCE(emotion, '')
+                ''')
+            for trigger in EVENT_STATS_TRIGGERS:
+                conn.execute(trigger)
         print("✓ Database initialized with indexes")
 
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of statements in one BEGIN IMMEDIATE ... COMMIT, rolled back
+        if the block raises. Yields the thread's connection; a block nested in an
+        open transaction joins it instead of committing early.
+        """
+        conn = self.get_connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
     def execute_query(self, query, params=None):
         """Execute a query and return results"""
         conn = self.get_connection()
@@ -161,11 +332,8 @@ class SharedDatabase:
                     p.get('post_type', 'text'), p.get('media_url'), p.get('link_url'), p.get('needs_extraction', 0)
                 )
             )
-        sql = '''INSERT OR IGNORE INTO raw_posts
-            (id, text, country, timestamp, source, url, author, score, post_type, media_url, link_url, needs_extraction)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?)'''
         # Execute in a single transaction
-        cursor.executemany(sql, records)
+        cursor.executemany(INSERT_RAW_POST_SQL, records)
         conn.commit()
         try:
             return cursor.rowcount if cursor.rowcount != -1 else len(records)
@@ -203,7 +371,7 @@ class SharedDatabase:
         
         for event_id, post_ids_json in cursor.fetchall():
             try:
-                post_ids = json.loads(post_ids_json)
+                post_ids = fast_json.loads(post_ids_json)
                 # Remove old post IDs from event
                 updated_post_ids = [pid for pid in post_ids if pid not in old_post_ids]
                 
@@ -212,7 +380,7 @@ class SharedDatabase:
                     events_to_delete.append(event_id)
                 elif len(updated_post_ids) < len(post_ids):
                     # Event lost some posts but still has valid ones - update it
-                    events_to_update.append((json.dumps(updated_post_ids), event_id))
+                    events_to_update.append((fast_json.dumps(updated_post_ids), event_id))
             except (json.JSONDecodeError, TypeError):
                 # Malformed post_ids - delete the event
                 events_to_delete.append(event_id)
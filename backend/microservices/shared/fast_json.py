@@ -0,0 +1,30 @@
+"""
+JSON helpers for the columns stored as JSON text (post_ids, emotions)
+Uses orjson when installed and falls back to the standard library
+"""
+
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+if ORJSON_AVAILABLE:
+    def loads(data):
+        """Parse JSON from str or bytes"""
+        return orjson.loads(data)
+
+    def dumps(obj) -> str:
+        """Serialize to a JSON string (str, so SQLite stores TEXT, not BLOB)"""
+        return orjson.dumps(obj).decode('utf-8')
+else:
+    def loads(data):
+        """Parse JSON from str or bytes"""
+        return json.loads(data)
+
+    def dumps(obj) -> str:
+        """Serialize to a JSON string"""
+        return json.dumps(obj)
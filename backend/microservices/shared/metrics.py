@@ -7,6 +7,11 @@ from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTEN
 from functools import wraps
 import time
 
+try:
+    from flask import request as flask_request
+except ImportError:
+    flask_request = None
+
 
 # Request metrics
 http_requests_total = Counter(
@@ -75,14 +80,15 @@ def track_request_metrics(f):
         endpoint = f.__name__
         
         # Try to get request context
-        try:
-            from flask import request
-            method = request.method
-            endpoint = request.endpoint or f.__name__
-        except (ImportError, RuntimeError):
-            pass
+        if flask_request is not None:
+            try:
+                method = flask_request.method
+                endpoint = flask_request.endpoint or f.__name__
+            except RuntimeError:
+                pass  # Called outside a request context
         
-        start_time = time.time()
+        # perf_counter is monotonic, so durations survive wall-clock adjustments
+        start_time = time.perf_counter()
         status = 500
         
         try:
@@ -99,7 +105,7 @@ def track_request_metrics(f):
             status = 500
             raise
         finally:
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             http_requests_total.labels(method=method, endpoint=endpoint, status=status).inc()
             http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
     
@@ -111,7 +117,7 @@ def track_processing_time(task_type):
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             try:
                 result = f(*args, **kwargs)
                 return result
@@ -120,7 +126,7 @@ def track_processing_time(task_type):
                 processing_errors_total.labels(task_type=task_type, error_type=error_type).inc()
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 processing_time_seconds.labels(task_type=task_type).observe(duration)
         
         return wrapper
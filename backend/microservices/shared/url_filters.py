@@ -0,0 +1,87 @@
+"""
+Shared URL classification helpers
+Decides whether a link points to social media (requires login, skipped)
+or to a news/blog site worth extracting
+"""
+
+import re
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# Social media hosts - matched against the host and all of its parent domains
+SOCIAL_MEDIA_DOMAINS = frozenset([
+    'twitter.com', 'x.com', 'facebook.com', 'instagram.com', 'tiktok.com',
+    'linkedin.com', 'reddit.com', 'youtube.com', 'youtu.be'
+])
+
+# News/blog outlets - matched against individual host labels (bbc.com, bbc.co.uk, ...)
+BLOG_DOMAINS = frozenset([
+    'bbc', 'cnn', 'theguardian', 'nytimes', 'reuters', 'aljazeera',
+    'france24', 'dw', 'lemonde', 'elpais', 'folha', 'globo',
+    'timesofindia', 'ndtv', 'thehindu', 'news', 'blog', 'medium',
+    'bloomberg', 'washingtonpost'
+])
+
+# Generic words that also qualify as a label suffix (foxnews.com, myblog.net)
+BLOG_LABEL_SUFFIXES = ('news', 'blog')
+
+# Path extensions of resources that are never HTML articles
+NON_HTML_EXTENSIONS = (
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg',
+    '.mp4', '.webm', '.mov', '.mp3', '.zip', '.doc', '.docx', '.xls', '.xlsx'
+)
+
+
+def _alternation(words):
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+# One anchored pattern classifies a host in a single pass. Social media is tried
+# first so that hosts like blog.twitter.com are never treated as news/blogs.
+_DOMAIN_RE = re.compile(
+    r'^(?:'
+    r'(?=(?:[^.]+\.)*(?:' + _alternation(SOCIAL_MEDIA_DOMAINS) + r')$)(?P<social>)'
+    r'|'
+    r'(?=(?:[^.]+\.)*?(?:' + _alternation(BLOG_DOMAINS) + r'|[^.]*(?:'
+    + _alternation(BLOG_LABEL_SUFFIXES) + r'))\.)(?P<blog>)'
+    r')'
+)
+
+
+@lru_cache(maxsize=4096)
+def extract_domain(url: str) -> str:
+    """Return the lowercased host of a URL, or '' if it has none"""
+    if not url:
+        return ''
+    if '//' not in url:
+        url = '//' + url
+    try:
+        host = urlparse(url).hostname
+    except ValueError:
+        return ''
+    return host.rstrip('.') if host else ''
+
+
+def has_non_html_extension(url: str) -> bool:
+    """Check whether a URL path ends in a known non-HTML file extension"""
+    try:
+        path = urlparse(url).path
+    except ValueError:
+        return False
+    return path.lower().endswith(NON_HTML_EXTENSIONS)
+
+
+def classify_domain(domain: str):
+    """Classify a host (see extract_domain) as 'social', 'blog' or None"""
+    match = _DOMAIN_RE.match(domain)
+    return match.lastgroup if match else None
+
+
+def is_social_media(domain: str) -> bool:
+    """Check a host and its parent domains against SOCIAL_MEDIA_DOMAINS"""
+    return classify_domain(domain) == 'social'
+
+
+def is_blog_platform(domain: str) -> bool:
+    """Check whether a non-social host has a label naming a news/blog outlet"""
+    return classify_domain(domain) == 'blog'
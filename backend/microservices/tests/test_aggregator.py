@@ -34,9 +34,8 @@ class TestAggregator:
             mock_cursor = Mock()
             mock_cursor.execute = Mock()
             mock_cursor.fetchall = Mock(return_value=[
-                ('joy', 0.9),
-                ('joy', 0.8),
-                ('sadness', 0.3)
+                ('united states', 'joy', 1.7, 2, 5),
+                ('united states', 'sadness', 0.3, 1, 1)
             ])
             mock_db.get_connection.return_value.cursor.return_value = mock_cursor
             
@@ -47,6 +46,8 @@ class TestAggregator:
             assert result['country'] == 'united states'
             assert 'emotions' in result
             assert 'top_emotion' in result
+            assert result['top_emotion'] == 'joy'
+            assert result['total_posts'] == 6
     
     def test_aggregate_country_no_data(self):
         """Test aggregating country without data"""
@@ -61,6 +62,27 @@ class TestAggregator:
             result = aggregator.aggregate_country('nonexistent')
             
             assert result is None
+    
+    def test_aggregate_all_countries_single_query(self):
+        """Test all countries are aggregated from one query, grouped case-insensitively"""
+        from aggregator.app import CountryEmotionAggregator
+        
+        with patch('aggregator.app.db') as mock_db:
+            mock_cursor = Mock()
+            mock_cursor.fetchall = Mock(return_value=[
+                ('france', 'joy', 0.8, 1, 2),
+                ('france', 'anger', 0.4, 1, 1),
+                ('india', 'fear', 0.6, 1, 1)
+            ])
+            mock_db.get_connection.return_value.cursor.return_value = mock_cursor
+            
+            aggregator = CountryEmotionAggregator()
+            results = {r['country']: r for r in aggregator.aggregate_all_countries()}
+            
+            assert mock_cursor.execute.call_count == 1
+            assert results['france']['total_posts'] == 3
+            assert results['france']['top_emotion'] == 'joy'
+            assert results['india']['emotions'] == {'fear': 0.6}
 
 
 class TestAggregationEndpoints:
@@ -85,8 +107,8 @@ class TestAggregationEndpoints:
     def test_aggregate_all_endpoint(self, mock_agg, client):
         """Test aggregate all countries endpoint"""
         mock_agg.aggregate_all_countries.return_value = [
-            {'country': 'usa', 'emotions': {'joy': 0.7}, 'top_emotion': 'joy', 'total_events': 50},
-            {'country': 'uk', 'emotions': {'sadness': 0.6}, 'top_emotion': 'sadness', 'total_events': 30}
+            {'country': 'usa', 'emotions': {'joy': 0.7}, 'top_emotion': 'joy', 'total_posts': 50},
+            {'country': 'uk', 'emotions': {'sadness': 0.6}, 'top_emotion': 'sadness', 'total_posts': 30}
         ]
         
         response = client.post('/aggregate/all')
@@ -116,16 +138,28 @@ class TestAggregationEndpoints:
 class TestCountriesEndpoint:
     """Test get all countries endpoint"""
     
-    @patch('aggregator.app.db')
-    def test_get_all_countries(self, mock_db, client):
+    def test_get_all_countries(self, client, tmp_path):
         """Test getting all aggregated countries"""
-        mock_db.execute_query.return_value = [
-            ('usa', '{"joy": 0.7}', 'joy', 50, '2025-12-12'),
-            ('uk', '{"sadness": 0.6}', 'sadness', 30, '2025-12-12')
-        ]
+        from database import SharedDatabase
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        insert = ('INSERT INTO country_emotions (country, emotions, top_emotion, total_posts, last_updated) '
+                  'VALUES (?, ?, ?, ?, ?)')
+        db.execute_commit(insert, ('usa', '{"joy": 0.7}', 'joy', 50, '2025-12-12'))
+        db.execute_commit(insert, ('uk', '{"sadness": 0.6}', 'sadness', 30, '2025-12-12'))
         
-        response = client.get('/countries')
+        with patch('aggregator.app.db', db):
+            response = client.get('/countries')
         assert response.status_code == 200
         data = json.loads(response.data)
         assert 'countries' in data
         assert data['total'] == 2
+        countries = {c['country']: c for c in data['countries']}
+        assert countries['usa']['emotions'] == {'joy': 0.7}
+        assert countries['uk']['total_posts'] == 30
+    
+    def test_get_all_countries_empty(self, client, tmp_path):
+        """Test an empty table gives an empty list"""
+        from database import SharedDatabase
+        with patch('aggregator.app.db', SharedDatabase(str(tmp_path / 'posts.db'))):
+            response = client.get('/countries')
+        assert json.loads(response.data) == {'countries': [], 'total': 0}
@@ -97,12 +97,11 @@ class TestStatsEndpoint:
         """Test successful stats retrieval"""
         with patch('api_gateway.app.db') as mock_db:
             mock_cursor = Mock()
-            mock_cursor.execute = Mock(return_value=Mock())
-            mock_cursor.fetchone = Mock(side_effect=[[5], [100]])
-            mock_cursor.fetchall = Mock(side_effect=[
-                [('joy', 50), ('sadness', 30), ('anger', 20)],
-                [('united states', 100)]
-            ])
+            mock_cursor.execute = Mock(return_value=Mock(fetchall=Mock(return_value=[
+                ('united states', 'joy', 50),
+                ('united states', 'sadness', 30),
+                ('france', 'anger', 20)
+            ])))
             mock_db.get_connection = Mock(return_value=Mock(cursor=Mock(return_value=mock_cursor)))
             
             response = client.get('/api/stats')
@@ -111,6 +110,10 @@ class TestStatsEndpoint:
             assert 'total' in data
             assert 'by_emotion' in data
             assert 'by_country' in data
+            assert data['total'] == 100
+            assert data['by_emotion'] == {'joy': 50, 'sadness': 30, 'anger': 20}
+            assert data['by_country'] == {'united states': 80, 'france': 20}
+            assert data['countries_ready'] == 2
 
 
 class TestCountryEndpoint:
@@ -0,0 +1,62 @@
+"""
+Unit tests for Content Extractor microservice
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add content-extractor directory to path
+CONTENT_EXTRACTOR_DIR = os.path.join(os.path.dirname(__file__), '..', 'content-extractor')
+sys.path.insert(0, CONTENT_EXTRACTOR_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+ARTICLE_TEXT = ('Le café est fermé depuis lundi, annonce la mairie après les inondations '
+                'qui ont touché le quartier du port pendant le week-end.')
+
+
+@pytest.fixture
+def extractor():
+    """Content extractor module with the database mocked"""
+    with patch('database.SharedDatabase'):
+        import importlib
+        import app as extractor_app
+        # Other service tests import their own module named app
+        sys.path.insert(0, CONTENT_EXTRACTOR_DIR)
+        importlib.reload(extractor_app)
+        yield extractor_app
+
+
+def page_response(body: bytes, content_type: str):
+    """Mock streamed response returning body for the given Content-Type"""
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.headers = {'Content-Type': content_type}
+    response.raw.read.return_value = body
+    return response
+
+
+class TestFetchArticleContent:
+    """Test article download and parsing"""
+    
+    @pytest.mark.parametrize('content_type', ['text/html; charset=utf-8', 'text/html'])
+    def test_utf8_page_without_meta_charset(self, extractor, content_type):
+        """Test UTF-8 text is not decoded as Latin-1 when the page has no <meta charset>"""
+        body = f'<html><body><article><p>{ARTICLE_TEXT}</p></article></body></html>'.encode('utf-8')
+        
+        with patch.object(extractor.SESSION, 'get', return_value=page_response(body, content_type)):
+            result = extractor.fetch_article_content('https://news.example.com/cafe', translate=False)
+        
+        assert result['success']
+        assert ARTICLE_TEXT in result['text']
+    
+    def test_meta_charset_used_without_header_charset(self, extractor):
+        """Test a page's own <meta charset> is honoured when the header has none"""
+        body = (f'<html><head><meta charset="windows-1252"></head>'
+                f'<body><article><p>{ARTICLE_TEXT}</p></article></body></html>').encode('cp1252')
+        
+        with patch.object(extractor.SESSION, 'get', return_value=page_response(body, 'text/html')):
+            result = extractor.fetch_article_content('https://news.example.com/cafe-1252', translate=False)
+        
+        assert result['success']
+        assert ARTICLE_TEXT in result['text']
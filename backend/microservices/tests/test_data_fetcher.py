@@ -129,6 +129,34 @@ class TestHelperFunctions:
             if 'database' in sys.modules:
                 del sys.modules['database']
     
+    @patch('app.get_country_subreddits', return_value=['worldnews', 'europe'])
+    @patch('app.reddit')
+    def test_multireddit_search_caps_each_subreddit(self, mock_reddit, mock_subs):
+        """Test a busy subreddit cannot fill the whole quota of the combined search"""
+        from app import search_regional_subreddits
+        import time
+        
+        def submission(post_id, subreddit_name):
+            post = Mock()
+            post.id = post_id
+            post.title = f'Post {post_id}'
+            post.selftext = 'Text post about the country'
+            post.created_utc = int(time.time())
+            post.is_self = True
+            post.subreddit.display_name = subreddit_name
+            return post
+        
+        busy = [submission(f'w{i}', 'worldnews') for i in range(80)]
+        quiet = [submission(f'e{i}', 'europe') for i in range(5)]
+        mock_reddit.subreddit.return_value.search.return_value = busy + quiet
+        
+        # per_sub_limit is 100 / 2 subreddits = 50
+        posts = search_regional_subreddits('germany', limit=100)
+        
+        mock_reddit.subreddit.assert_called_once_with('worldnews+europe')
+        assert sum(post['post_id'].startswith('w') for post in posts) == 50
+        assert sum(post['post_id'].startswith('e') for post in posts) == 5
+    
     def test_classify_and_extract_post_text_only(self):
         """Test classifying text-only posts"""
         import sys
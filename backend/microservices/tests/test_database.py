@@ -0,0 +1,133 @@
+"""
+Unit tests for the shared database module
+"""
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+from database import SharedDatabase
+
+
+def _connection_in_thread(db):
+    """Return the connection a fresh thread gets from db"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(db.get_connection()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TestConnectionPool:
+    """Test pooled per-thread connections"""
+
+    def test_same_thread_reuses_connection(self, tmp_path):
+        """Test a thread keeps the same connection"""
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        assert db.get_connection() is db.get_connection()
+
+    def test_finished_thread_returns_connection(self, tmp_path):
+        """Test a connection from a finished thread is reused by the next one"""
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        first = _connection_in_thread(db)
+        second = _connection_in_thread(db)
+        assert first is second
+        assert first is not db.get_connection()
+
+    def test_uncommitted_work_is_discarded(self, tmp_path):
+        """Test a pooled connection does not carry over an open transaction"""
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+
+        def insert_without_commit():
+            db.get_connection().execute(
+                "INSERT INTO raw_posts (id, text, country, timestamp) VALUES ('p1', 't', 'france', '2025')"
+            )
+
+        thread = threading.Thread(target=insert_without_commit)
+        thread.start()
+        thread.join()
+
+        assert db.execute_query('SELECT COUNT(*) FROM raw_posts')[0][0] == 0
+
+
+class TestEventStats:
+    """Test the trigger-maintained event_stats table"""
+
+    def _stats(self, db):
+        return sorted(db.execute_query('SELECT country, emotion, event_count FROM event_stats'))
+
+    def test_triggers_track_analyzed_events(self, tmp_path):
+        """Test inserts, analysis updates and deletes are reflected in the counts"""
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        insert = ("INSERT INTO events (id, country, title, description, post_ids, event_date, emotion, is_analyzed) "
+                  "VALUES (?, ?, 't', 'd', '[]', '2025-01-01', ?, ?)")
+        db.execute_commit(insert, (1, 'france', 'joy', 1))
+        db.execute_commit(insert, (2, 'france', None, 0))
+        assert self._stats(db) == [('france', 'joy', 1)]
+
+        db.execute_commit("UPDATE events SET emotion = 'joy', is_analyzed = 1 WHERE id = 2")
+        assert self._stats(db) == [('france', 'joy', 2)]
+
+        db.execute_commit("UPDATE events SET emotion = 'anger' WHERE id = 1")
+        assert self._stats(db) == [('france', 'anger', 1), ('france', 'joy', 1)]
+
+        db.execute_commit('DELETE FROM events')
+        assert self._stats(db) == []
+
+    def test_existing_events_are_backfilled(self, tmp_path):
+        """Test a database created before event_stats gets its counts on startup"""
+        path = str(tmp_path / 'posts.db')
+        db = SharedDatabase(path)
+        for trigger in ('event_stats_insert', 'event_stats_delete', 'event_stats_update'):
+            db.execute_commit(f'DROP TRIGGER {trigger}')
+        db.execute_commit('DROP TABLE event_stats')
+        db.execute_commit("INSERT INTO events (country, title, description, post_ids, event_date, emotion, is_analyzed) "
+                          "VALUES ('india', 't', 'd', '[]', '2025-01-01', 'fear', 1)")
+
+        assert self._stats(SharedDatabase(path)) == [('india', 'fear', 1)]
+
+
+class TestTransaction:
+    """Test the transaction context manager"""
+
+    def test_commits_block(self, tmp_path):
+        """Test statements in the block are committed together"""
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO raw_posts (id, text, country, timestamp) VALUES ('p1', 't', 'france', '2025')")
+            conn.execute("INSERT INTO raw_posts (id, text, country, timestamp) VALUES ('p2', 't', 'france', '2025')")
+
+        assert _connection_in_thread(db).execute('SELECT COUNT(*) FROM raw_posts').fetchone()[0] == 2
+
+    def test_rolls_back_on_error(self, tmp_path):
+        """Test nothing from a failed block is kept"""
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        try:
+            with db.transaction() as conn:
+                conn.execute("INSERT INTO raw_posts (id, text, country, timestamp) VALUES ('p1', 't', 'france', '2025')")
+                with db.transaction():
+                    raise ValueError('boom')
+        except ValueError:
+            pass
+
+        assert db.execute_query('SELECT COUNT(*) FROM raw_posts')[0][0] == 0
+        assert not db.get_connection().in_transaction
+
+
+class TestFetchPostUrls:
+    """Test batched post URL lookup"""
+
+    def test_fetch_post_urls(self, tmp_path):
+        """Test URLs of many posts come back keyed by id, skipping posts without one"""
+        from database import fetch_post_urls
+        db = SharedDatabase(str(tmp_path / 'posts.db'))
+        insert = "INSERT INTO raw_posts (id, text, country, timestamp, url) VALUES (?, 't', 'france', '2025', ?)"
+        for post_id, url in (('p1', 'https://a.example'), ('p2', None), ('p3', 'https://c.example')):
+            db.execute_commit(insert, (post_id, url))
+
+        cursor = db.get_connection().cursor()
+        assert fetch_post_urls(cursor, ['p3', 'p1', 'p2', 'p1', 'missing']) == {
+            'p1': 'https://a.example', 'p3': 'https://c.example'
+        }
+        assert fetch_post_urls(cursor, []) == {}
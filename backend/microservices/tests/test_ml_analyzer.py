@@ -10,12 +10,18 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'ml-analyzer'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
+# Seconds to wait for the background model load before failing the tests
+MODEL_LOAD_TIMEOUT = 300
+
 @pytest.fixture
 def app():
     """Create test Flask app"""
     with patch('database.SharedDatabase'):
         import app as ml_app
         ml_app.app.config['TESTING'] = True
+        # The module analyzer loads its model in the background
+        if not ml_app.analyzer.model_ready.wait(timeout=MODEL_LOAD_TIMEOUT):
+            pytest.fail(f"Emotion model did not finish loading within {MODEL_LOAD_TIMEOUT}s")
         yield ml_app.app
 
 @pytest.fixture
@@ -34,6 +40,53 @@ class TestEmotionAnalyzer:
             analyzer = EmotionAnalyzer()
             assert analyzer is not None
     
+    def test_analyze_emotion_batch(self):
+        """Test texts are classified in one model call, short ones via VADER"""
+        from app import EmotionAnalyzer
+        with patch('app.pipeline'):
+            analyzer = EmotionAnalyzer()
+        analyzer.emotion_available = True
+        analyzer.emotion_classifier = Mock(return_value=[{'label': 'fear', 'score': 0.8}])
+        
+        results = analyzer.analyze_emotion_batch(['Storm warnings across the coast', 'short'])
+        
+        analyzer.emotion_classifier.assert_called_once()
+        assert analyzer.emotion_classifier.call_args[0][0] == ['Storm warnings across the coast']
+        assert results[0]['top_emotion'] == 'fear'
+        assert results[1]['top_emotion'] in ('joy', 'sadness', 'neutral')
+    
+    def test_duplicate_texts_classified_once(self):
+        """Test identical texts in a batch share one model result"""
+        from app import EmotionAnalyzer
+        with patch('app.pipeline'):
+            analyzer = EmotionAnalyzer()
+        analyzer.emotion_available = True
+        analyzer.emotion_classifier = Mock(
+            side_effect=lambda chunk, batch_size: [{'label': 'anger', 'score': 0.7}] * len(chunk)
+        )
+        
+        results = analyzer.analyze_emotion_batch(['Protests in the capital'] * 3)
+        
+        assert analyzer.emotion_classifier.call_args[0][0] == ['Protests in the capital']
+        assert [result['top_emotion'] for result in results] == ['anger'] * 3
+    
+    def test_batches_split_by_length_bucket(self):
+        """Test texts of very different lengths are not padded into one batch"""
+        from app import EmotionAnalyzer
+        with patch('app.pipeline'):
+            analyzer = EmotionAnalyzer()
+        analyzer.emotion_available = True
+        analyzer.emotion_classifier = Mock(
+            side_effect=lambda chunk, batch_size: [{'label': 'joy', 'score': 0.9}] * len(chunk)
+        )
+        texts = ['long ' * 40, 'short text one', 'short text two!']
+        
+        results = analyzer.analyze_emotion_batch(texts)
+        
+        batches = [call[0][0] for call in analyzer.emotion_classifier.call_args_list]
+        assert batches == [['short text one', 'short text two!'], [texts[0]]]
+        assert all(result['top_emotion'] == 'joy' for result in results)
+    
     @patch('app.EmotionAnalyzer')
     def test_analyze_text_success(self, mock_analyzer, client):
         """Test successful text analysis"""
@@ -76,18 +129,40 @@ class TestBatchProcessing:
         mock_db.get_connection.return_value = mock_conn
         
         # Mock analyzer
-        mock_analyzer.analyze_full.return_value = {
+        mock_analyzer.analyze_batch.return_value = [{
             'emotion': {
                 'top_emotion': 'joy',
                 'confidence': 0.9
             },
             'is_collective': True
-        }
+        }]
         
-        response = client.post('/process/pending')
+        response = client.post('/process/pending', json={})
         assert response.status_code == 200
         data = response.get_json()
         assert data['processed'] == 1
+        # The writer thread stored the chunk in one executemany and commit
+        mock_conn.executemany.assert_called_once()
+        assert mock_conn.executemany.call_args[0][1] == [('joy', 0.9, 'id1')]
+        mock_conn.commit.assert_called_once()
+    
+    @patch('app.analyzer')
+    def test_analyze_batch_endpoint(self, mock_analyzer, client):
+        """Test texts are analyzed in one batched call"""
+        mock_analyzer.analyze_batch.return_value = [
+            {'emotion': {'top_emotion': 'joy', 'confidence': 0.9}, 'is_collective': True},
+            {'emotion': {'top_emotion': 'fear', 'confidence': 0.7}, 'is_collective': True}
+        ]
+        
+        response = client.post('/analyze/batch', json={'texts': ['Good news', 'Storm warning']})
+        assert response.status_code == 200
+        mock_analyzer.analyze_batch.assert_called_once_with(['Good news', 'Storm warning'])
+        assert [r['emotion']['top_emotion'] for r in response.get_json()['results']] == ['joy', 'fear']
+    
+    def test_analyze_batch_missing_texts(self, client):
+        """Test batch analysis without texts"""
+        response = client.post('/analyze/batch', json={'texts': []})
+        assert response.status_code == 400
 
 
 @pytest.mark.requires_ml
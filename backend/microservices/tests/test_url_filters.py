@@ -0,0 +1,74 @@
+"""
+Unit tests for shared URL classification helpers
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+from url_filters import extract_domain, is_social_media, is_blog_platform, has_non_html_extension
+
+
+class TestExtractDomain:
+    """Test host extraction"""
+
+    def test_extract_domain(self):
+        """Test host is lowercased and stripped of port and path"""
+        assert extract_domain('https://WWW.BBC.com:443/news/test') == 'www.bbc.com'
+        assert extract_domain('twitter.com/user/status/1') == 'twitter.com'
+        assert extract_domain('') == ''
+
+
+class TestNonHtmlExtension:
+    """Test file extension filtering"""
+
+    def test_non_html_extensions(self):
+        """Test files are detected from the path only"""
+        assert has_non_html_extension('https://example.com/report.PDF')
+        assert has_non_html_extension('https://example.com/photo.jpg?size=large')
+        assert not has_non_html_extension('https://example.com/news/story.html')
+        assert not has_non_html_extension('https://example.com/page?file=doc.pdf')
+
+
+class TestSocialMedia:
+    """Test social media detection"""
+
+    def test_social_media_subdomains(self):
+        """Test hosts and their subdomains are matched"""
+        assert is_social_media('twitter.com')
+        assert is_social_media('mobile.twitter.com')
+        assert is_social_media('www.youtube.com')
+
+    def test_social_media_no_substring_matches(self):
+        """Test unrelated hosts containing a social domain are not matched"""
+        assert not is_social_media('www.netflix.com')
+        assert not is_social_media('myyoutu.beyond.com')
+        assert not is_social_media('')
+
+
+class TestBlogPlatform:
+    """Test news/blog detection"""
+
+    def test_blog_platform_labels(self):
+        """Test outlets are matched on any host label"""
+        assert is_blog_platform('www.bbc.co.uk')
+        assert is_blog_platform('edition.cnn.com')
+        assert is_blog_platform('www.foxnews.com')
+
+    def test_blog_platform_rejects_other_hosts(self):
+        """Test TLDs and unrelated hosts are not matched"""
+        assert not is_blog_platform('example.com')
+        assert not is_blog_platform('www.reddit.com')
+        assert not is_blog_platform('example.news')
+
+
+class TestClassifyDomain:
+    """Test single-pass host classification"""
+
+    def test_classify_domain(self):
+        """Test each category and the social media precedence"""
+        from url_filters import classify_domain
+        assert classify_domain('www.twitter.com') == 'social'
+        assert classify_domain('blog.twitter.com') == 'social'
+        assert classify_domain('www.theguardian.com') == 'blog'
+        assert classify_domain('example.com') is None
@@ -26,13 +26,29 @@ start_service() {
     echo "✓ $service_name started (PID: $(cat $PROJECT_ROOT/logs/${service_name}.pid))"
 }
 
+# Function to start a service under gunicorn (settings in the service's gunicorn.conf.py)
+start_gunicorn_service() {
+    local service_name=$1
+    local service_dir=$2
+    local port=$3
+    
+    echo "Starting $service_name on port $port (gunicorn)..."
+    cd "$PROJECT_ROOT/backend/microservices/$service_dir"
+    
+    GUNICORN="$PROJECT_ROOT/backend/.venv/bin/gunicorn"
+    
+    PORT=$port nohup $GUNICORN app:app > "$PROJECT_ROOT/logs/${service_name}.log" 2>&1 &
+    echo $! > "$PROJECT_ROOT/logs/${service_name}.pid"
+    echo "✓ $service_name started (PID: $(cat $PROJECT_ROOT/logs/${service_name}.pid))"
+}
+
 # Create logs directory
 mkdir -p "$PROJECT_ROOT/logs"
 
 # Start all services
 start_service "data-fetcher" "data-fetcher" 5001
 sleep 2
-start_service "content-extractor" "content-extractor" 5007
+start_gunicorn_service "content-extractor" "content-extractor" 5007
 sleep 2
 start_service "event-extractor" "event-extractor" 5004
 sleep 2